@@ -0,0 +1,223 @@
+"""
+Admission Control
+Bounded concurrency and a FIFO wait queue in front of Ollama calls
+
+At most max_concurrent LLM calls run at once. Up to max_queue more wait
+in arrival order; beyond that callers are rejected immediately (429), and a
+caller that waits longer than its timeout gives up (503).
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+import numpy as np
+import metrics
+
+
+class AdmissionRejected(Exception):
+    """Raised when a call cannot be admitted - carries the HTTP status to surface"""
+
+    status_code = 503
+
+    def __init__(self, detail: str, retry_after: int = 1):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class QueueFullError(AdmissionRejected):
+    """The wait queue is at max depth"""
+
+    status_code = 429
+
+
+class QueueTimeoutError(AdmissionRejected):
+    """Waited longer than the timeout for a slot"""
+
+    status_code = 503
+
+
+class _Waiter:
+    """A queued caller - async waiters hold a future, sync waiters an event"""
+
+    __slots__ = ("loop", "future", "event", "granted")
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.event = threading.Event() if loop is None else None
+        self.granted = False
+
+
+class AdmissionController:
+    """FIFO semaphore shared by sync (thread) and async (event loop) callers"""
+
+    def __init__(self, max_concurrent: int = 2, max_queue: int = 32,
+                 timeout: float = 60.0, history: int = 1024):
+        """
+        Args:
+            max_concurrent: LLM calls allowed in flight (0 = unlimited)
+            max_queue: Callers allowed to wait for a slot
+            timeout: Default seconds a caller waits before a 503
+            history: Recent queue-wait samples kept for percentiles
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = deque()
+        self._wait_times = deque(maxlen=history)
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        """Hold one slot for the duration of a blocking LLM call"""
+        self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, timeout: Optional[float] = None):
+        """Hold one slot for the duration of an awaited (or streamed) LLM call"""
+        await self.aacquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, timeout: Optional[float] = None):
+        start = time.perf_counter()
+        waiter = self._enqueue(None)
+        if waiter is None:
+            self._record_wait(start)
+            return
+
+        waiter.event.wait(self.timeout if timeout is None else timeout)
+        self._finish_wait(waiter, start)
+
+    async def aacquire(self, timeout: Optional[float] = None):
+        start = time.perf_counter()
+        waiter = self._enqueue(asyncio.get_running_loop())
+        if waiter is None:
+            self._record_wait(start)
+            return
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future),
+                                   self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Client went away while queued - give back a slot handed over meanwhile
+            if not self._withdraw(waiter):
+                self.release()
+            raise
+        self._finish_wait(waiter, start)
+
+    def check_capacity(self):
+        """
+        Raise QueueFullError if a caller arriving now would be rejected
+
+        Takes no slot - lets a streaming request fail with a 429 before its
+        first event while the slot itself is only taken around generation.
+        """
+        with self._lock:
+            if self._is_full():
+                self.rejected_full += 1
+                raise self._queue_full_error()
+
+    def release(self):
+        """Free a slot, handing it straight to the oldest waiter if there is one"""
+        with self._lock:
+            if self.max_concurrent <= 0:
+                self._active -= 1
+                return
+            if not self._waiters:
+                self._active -= 1
+                return
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+
+        # The slot now belongs to the waiter, so _active is unchanged
+        if waiter.loop is None:
+            waiter.event.set()
+        else:
+            waiter.loop.call_soon_threadsafe(self._resolve, waiter)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            waits = np.array(self._wait_times, dtype=np.float64) if self._wait_times else None
+            return {
+                "active": self._active,
+                "queued": len(self._waiters),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected_full": self.rejected_full,
+                "rejected_timeout": self.rejected_timeout,
+                "queue_wait_avg_ms": round(float(waits.mean()) * 1000, 2) if waits is not None else 0.0,
+                "queue_wait_p95_ms": round(float(np.percentile(waits, 95)) * 1000, 2) if waits is not None else 0.0,
+                "queue_wait_max_ms": round(float(waits.max()) * 1000, 2) if waits is not None else 0.0
+            }
+
+    def _enqueue(self, loop) -> Optional[_Waiter]:
+        """Take a free slot (returns None) or join the queue (returns the waiter)"""
+        with self._lock:
+            if self.max_concurrent <= 0 or (self._active < self.max_concurrent and not self._waiters):
+                self._active += 1
+                return None
+            if len(self._waiters) >= self.max_queue:
+                self.rejected_full += 1
+                raise self._queue_full_error()
+            waiter = _Waiter(loop)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _is_full(self) -> bool:
+        """No free slot and no room in the queue (caller holds the lock)"""
+        if self.max_concurrent <= 0 or (self._active < self.max_concurrent and not self._waiters):
+            return False
+        return len(self._waiters) >= self.max_queue
+
+    def _queue_full_error(self) -> QueueFullError:
+        return QueueFullError(
+            f"LLM queue is full ({self.max_queue} waiting), try again shortly",
+            retry_after=max(1, int(self.timeout / 4))
+        )
+
+    def _finish_wait(self, waiter: _Waiter, start: float):
+        if not waiter.granted and self._withdraw(waiter):
+            with self._lock:
+                self.rejected_timeout += 1
+            raise QueueTimeoutError(
+                f"Timed out waiting for the LLM after {time.perf_counter() - start:.1f}s",
+                retry_after=max(1, int(self.timeout / 2))
+            )
+        self._record_wait(start)
+
+    def _withdraw(self, waiter: _Waiter) -> bool:
+        """Remove a waiter that was not granted a slot (False if it already was)"""
+        with self._lock:
+            if waiter.granted:
+                return False
+            self._waiters.remove(waiter)
+            return True
+
+    def _record_wait(self, start: float):
+        wait = time.perf_counter() - start
+        with self._lock:
+            self.admitted += 1
+            self._wait_times.append(wait)
+        metrics.observe("llm_queue_wait", wait)
+
+    @staticmethod
+    def _resolve(waiter: _Waiter):
+        if not waiter.future.done():
+            waiter.future.set_result(None)
@@ -2,18 +2,94 @@
 FastAPI Backend Server for RAG Query System
 Provides REST API endpoints for the React frontend
 """
+import asyncio
+import json
+import logging
 import os
-from fastapi import FastAPI, HTTPException
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from query_handler import QueryHandler
 import uvicorn
+import metrics
+from admission import AdmissionRejected
+
+logger = logging.getLogger("uvicorn.error")
+
+# Using mistral (~4GB, good quality) - llama3 is too big, llama3.2:7b doesn't exist
+LLM_MODEL = os.getenv("LLM_MODEL", "mistral")
+
+# How long a query arriving during warm-up waits before getting a 503
+STARTUP_WAIT_SECONDS = float(os.getenv("STARTUP_WAIT_SECONDS", "30"))
+
+
+def load_handler():
+    """Build the query handler - imports and loads the embedder, Chroma and Ollama clients"""
+    start = time.perf_counter()
+    # Imported here so the app module itself stays cheap to import
+    from query_handler import QueryHandler
+    imported = time.perf_counter()
+    
+    handler = QueryHandler(llm_model=LLM_MODEL)
+    handler.warm_up()
+    loaded = time.perf_counter()
+    
+    logger.info(
+        f"Query handler ready in {loaded - start:.2f}s "
+        f"(imports {imported - start:.2f}s, models + DB {loaded - imported:.2f}s)"
+    )
+    register_stats(handler)
+    return handler
+
+
+def register_stats(handler):
+    """Publish cache, routing tier and LLM queue stats on /metrics"""
+    metrics.register_stats("routing_tiers", handler.router.tier_stats)
+    metrics.register_stats("llm_queue", handler.llm_gate.stats)
+    if handler.semantic_cache is not None:
+        metrics.register_stats("semantic_cache", handler.semantic_cache.stats)
+    if handler.router.routing_cache is not None:
+        metrics.register_stats("routing_cache", handler.router.routing_cache.stats)
+    if handler.router.routing_batcher is not None:
+        metrics.register_stats("routing_batcher", handler.router.routing_batcher.stats)
+
+
+async def warm_up(app: FastAPI):
+    """Background task: load heavy resources without blocking startup"""
+    try:
+        app.state.handler = await asyncio.to_thread(load_handler)
+        app.state.startup_seconds = time.perf_counter() - app.state.started_at
+        logger.info(f"Cold start complete in {app.state.startup_seconds:.2f}s")
+    except Exception as e:
+        app.state.startup_error = str(e)
+        logger.exception("Warm-up failed")
+    finally:
+        app.state.ready.set()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Bind the port immediately and warm up in the background"""
+    app.state.started_at = time.perf_counter()
+    app.state.handler = None
+    app.state.startup_error = None
+    app.state.startup_seconds = None
+    app.state.ready = asyncio.Event()
+    
+    warm_up_task = asyncio.create_task(warm_up(app))
+    yield
+    warm_up_task.cancel()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Gojira Album Chat API",
     description="RAG-based query system for Gojira albums",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS - allow React frontend to connect
@@ -31,21 +107,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize query handler (singleton - initialized once)
-# Using mistral (~4GB, good quality) - llama3 is too big, llama3.2:7b doesn't exist
-handler = QueryHandler(llm_model="mistral")
+
+async def get_handler():
+    """Dependency: the warmed-up query handler, waiting briefly during warm-up"""
+    try:
+        await asyncio.wait_for(app.state.ready.wait(), timeout=STARTUP_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Service is warming up, try again shortly")
+    
+    if app.state.handler is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Service failed to start: {app.state.startup_error}"
+        )
+    return app.state.handler
 
 
 # Request/Response models
 class QueryRequest(BaseModel):
     query: str
     k: int = 10  # Number of documents to retrieve
+    include_timings: bool = False  # Return per-stage latencies and token counts
 
 
 class QueryResponse(BaseModel):
     answer: str
     query: str
     routing: dict = None
+    cached: bool = False
+    timings: Optional[dict] = None
+
+
+def routing_payload(routing: dict) -> dict:
+    """Public subset of a routing result returned to clients"""
+    return {
+        "query_type": routing.get("query_type"),
+        "sections": routing.get("sections", []),
+        "albums": routing.get("albums", []),
+        "confidence": routing.get("confidence", 0),
+        "method": routing.get("method", "unknown")
+    }
+
+
+def sse_event(event: str, data) -> str:
+    """Format a single Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
 # Health check endpoint
@@ -60,38 +166,75 @@ async def root():
 
 @app.get("/health")
 async def health():
+    # Liveness only - answers as soon as the port is bound
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness - 200 once the embedder, Chroma and LLM clients are loaded"""
+    if app.state.handler is not None:
+        return {
+            "status": "ready",
+            "startup_seconds": round(app.state.startup_seconds, 2),
+            "llm_queue": app.state.handler.llm_gate.stats()
+        }
+    
+    if app.state.startup_error:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "failed", "detail": app.state.startup_error}
+        )
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": "warming_up",
+            "elapsed_seconds": round(time.perf_counter() - app.state.started_at, 2)
+        }
+    )
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc: AdmissionRejected):
+    """Overload: 429 when the LLM queue is full, 503 when waiting timed out"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics: per-stage latency histograms, token counts and cache/queue gauges"""
+    payload, content_type = metrics.render()
+    return Response(content=payload, media_type=content_type)
+
+
 # Main query endpoint
 @app.post("/api/query", response_model=QueryResponse)
-async def query_endpoint(request: QueryRequest):
+async def query_endpoint(request: QueryRequest, handler=Depends(get_handler)):
     """
     Process a query and return the answer with routing information
     """
     try:
-        # Get routing info first (without verbose output)
-        routing = handler.router.route_query(request.query)
-        
-        # Execute query (verbose=False for API responses)
-        answer_text = handler.query(
+        # Route once and execute (verbose=False for API responses)
+        result = await handler.aquery_with_routing(
             request.query, 
             k=request.k, 
             verbose=False
         )
         
         return QueryResponse(
-            answer=answer_text,
+            answer=result["answer"],
             query=request.query,
-            routing={
-                "query_type": routing.get("query_type"),
-                "sections": routing.get("sections", []),
-                "albums": routing.get("albums", []),
-                "confidence": routing.get("confidence", 0),
-                "method": routing.get("method", "unknown")
-            }
+            routing=routing_payload(result["routing"]),
+            cached=result["cached"],
+            timings=result["timings"] if request.include_timings else None
         )
     
+    except AdmissionRejected:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -99,6 +242,67 @@ async def query_endpoint(request: QueryRequest):
         )
 
 
+# Streaming query endpoint (Server-Sent Events)
+@app.post("/api/query/stream")
+async def query_stream_endpoint(request: QueryRequest, handler=Depends(get_handler)):
+    """
+    Stream a query as Server-Sent Events:
+    "routing" first, then one "token" event per answer chunk, then "done"
+    """
+    events = handler.astream_query(request.query, k=request.k)
+    # Wait for the first event (routing, after the LLM queue-capacity check)
+    # before sending headers, so a full queue is reported as a 429 status
+    # rather than mid-stream; a later wait timeout arrives as an "error" event
+    try:
+        first_event = await events.__anext__()
+    except AdmissionRejected:
+        raise
+    except StopAsyncIteration:
+        first_event = None
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing query: {str(e)}"
+        )
+    
+    async def prepend_first():
+        try:
+            if first_event is not None:
+                yield first_event
+                async for event in events:
+                    yield event
+        finally:
+            # Release the LLM slot promptly if the client disconnects
+            await events.aclose()
+    
+    async def event_stream():
+        timings = None
+        try:
+            async for event in prepend_first():
+                if event["event"] == "routing":
+                    yield sse_event("routing", routing_payload(event["data"]))
+                elif event["event"] == "timings":
+                    timings = event["data"]
+                else:
+                    yield sse_event("token", {"token": event["data"]})
+            done = {"query": request.query}
+            if request.include_timings:
+                done["timings"] = timings
+            yield sse_event("done", done)
+        except Exception as e:
+            # Headers are already sent, so errors travel as an event
+            yield sse_event("error", {"detail": f"Error processing query: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering
+        }
+    )
+
+
 # Run the server
 if __name__ == "__main__":
     uvicorn.run(
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark: compiled keyword matcher vs the original substring loop
+Usage: python bench_keyword_matcher.py [iterations]
+"""
+import sys
+import timeit
+from router import QueryRouter
+
+# Queries from demo_router.py plus a few longer ones
+QUERIES = [
+    "How many songs are in The Link?",
+    "What is the guitar work like on From Mars to Sirius?",
+    "Compare the technical analysis between The Link and From Mars to Sirius",
+    "What are the differences in lyrical themes between both albums?",
+    "Tell me about the production and recording of The Link",
+    "What is The Link album about?",
+    "Was the live performance delivered well on the tour, and how did critics review the recording?",
+    "Which label released From Mars to Sirius, when was it recorded and who were the band members?",
+    "Who delivered the vocals on The Link?",
+]
+
+
+def legacy_scan(query: str):
+    """The pre-matcher implementation: substring checks for every keyword"""
+    query_lower = query.lower()
+    compare_keywords = ["compare", "comparison", "difference", "differences", "vs", "versus", "both albums", "both"]
+    is_comparison = any(keyword in query_lower for keyword in compare_keywords)
+    section_scores = {}
+    for section, keywords in QueryRouter.SECTION_KEYWORDS.items():
+        score = sum(1 for keyword in keywords if keyword in query_lower)
+        if score > 0:
+            section_scores[section] = score
+    return section_scores, is_comparison
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    matcher = QueryRouter.build_keyword_matcher()
+
+    def run_legacy():
+        for query in QUERIES:
+            legacy_scan(query)
+
+    def run_matcher():
+        for query in QUERIES:
+            matcher.scan(query)
+
+    build_us = timeit.timeit(QueryRouter.build_keyword_matcher, number=100) / 100 * 1e6
+    legacy_us = timeit.timeit(run_legacy, number=iterations) / (iterations * len(QUERIES)) * 1e6
+    matcher_us = timeit.timeit(run_matcher, number=iterations) / (iterations * len(QUERIES)) * 1e6
+
+    print(f"Matcher build (once per router): {build_us:8.1f} µs")
+    print(f"Legacy substring loop:           {legacy_us:8.2f} µs/query")
+    print(f"Aho-Corasick matcher:            {matcher_us:8.2f} µs/query")
+    print(f"Speedup:                         {legacy_us / matcher_us:8.2f}x")
+
+    print("\nMatch differences (legacy substring hits vs whole-word matcher):")
+    differences = 0
+    for query in QUERIES:
+        legacy_sections = set(legacy_scan(query)[0])
+        matcher_sections = {value for (kind, value), _ in matcher.scan(query) if kind == "section"}
+        if legacy_sections != matcher_sections:
+            differences += 1
+            print(f"  {query!r}")
+            print(f"    only legacy:  {sorted(legacy_sections - matcher_sections)}")
+            print(f"    only matcher: {sorted(matcher_sections - legacy_sections)}")
+    if not differences:
+        print("  (none)")
+
+
+if __name__ == "__main__":
+    main()
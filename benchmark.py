@@ -0,0 +1,291 @@
+"""
+Benchmark and load-test harness
+Replays a query corpus against QueryHandler and the FastAPI app at fixed
+concurrency levels; reports p50/p95/p99 per pipeline stage plus QPS as JSON
+
+Every LLM call goes to an in-process stub Ollama server (stub_ollama.py) with
+configurable latency unless --ollama-url is given, so runs need no model and
+stay comparable over time.
+
+Usage:
+    python benchmark.py                                # handler + API, concurrency 1,4,8
+    python benchmark.py --target api --concurrency 16 --requests 200
+    python benchmark.py --url http://localhost:8000    # load-test a running server
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+DEFAULT_CORPUS = "bench_queries.txt"
+DEFAULT_OUTPUT_DIR = "bench_results"
+
+
+def load_corpus(path: str) -> List[str]:
+    """Queries from a text file (one per line) or JSONL ("query" or "title" field)"""
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                line = record.get("query") or record.get("title") or ""
+            if line:
+                queries.append(line)
+    return queries
+
+
+def percentiles(values: List[float]) -> Dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    array = np.asarray(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(array, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "mean": round(float(array.mean()), 2),
+        "max": round(float(array.max()), 2)
+    }
+
+
+def summarize(target: str, concurrency: int, samples: List[Dict], wall_seconds: float,
+              llm_calls: Optional[int]) -> Dict:
+    """Aggregate per-request samples into one result row"""
+    ok = [sample for sample in samples if sample["ok"]]
+    stage_values = defaultdict(list)
+    counter_values = defaultdict(list)
+    for sample in ok:
+        timings = sample.get("timings") or {}
+        for stage, entry in timings.get("stages", {}).items():
+            stage_values[stage].append(entry["ms"])
+        for name, value in timings.items():
+            if name not in ("stages", "total_ms") and isinstance(value, (int, float)):
+                counter_values[name].append(value)
+
+    return {
+        "target": target,
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "outcomes": dict(Counter(sample["outcome"] for sample in samples)),
+        "wall_seconds": round(wall_seconds, 3),
+        "qps": round(len(ok) / wall_seconds, 2) if wall_seconds > 0 else None,
+        "llm_calls": llm_calls,
+        "latency_ms": percentiles([sample["latency_ms"] for sample in ok]),
+        "stages_ms": {
+            stage: {**percentiles(values), "requests": len(values)}
+            for stage, values in sorted(stage_values.items())
+        },
+        "counters_mean": {
+            name: round(float(np.mean(values)), 2) for name, values in sorted(counter_values.items())
+        }
+    }
+
+
+def run_handler(handler, queries: List[str], concurrency: int, k: int) -> Tuple[List[Dict], float]:
+    """Drive QueryHandler.query_with_routing from a thread pool"""
+    def one(query: str) -> Dict:
+        start = time.perf_counter()
+        try:
+            result = handler.query_with_routing(query, k=k, verbose=False)
+            outcome, ok, timings = ("cached" if result["cached"] else "ok"), True, result["timings"]
+        except Exception as e:
+            outcome, ok, timings = type(e).__name__, False, None
+        return {"ok": ok, "outcome": outcome, "timings": timings,
+                "latency_ms": (time.perf_counter() - start) * 1000}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, queries))
+    return samples, time.perf_counter() - start
+
+
+async def run_api(client, queries: List[str], concurrency: int, k: int) -> Tuple[List[Dict], float]:
+    """
+    Drive POST /api/query with at most `concurrency` requests in flight
+
+    Every other request leaves include_timings unset, so the default response
+    path is exercised too; stage percentiles come from the timed half.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int, query: str) -> Dict:
+        payload = {"query": query, "k": k}
+        if index % 2 == 0:
+            payload["include_timings"] = True
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/api/query", json=payload)
+                latency_ms = (time.perf_counter() - start) * 1000
+                if response.status_code == 200:
+                    body = response.json()
+                    outcome = "cached" if body.get("cached") else "ok"
+                    return {"ok": True, "outcome": outcome, "timings": body.get("timings"),
+                            "latency_ms": latency_ms}
+                return {"ok": False, "outcome": f"http_{response.status_code}", "timings": None,
+                        "latency_ms": latency_ms}
+            except Exception as e:
+                return {"ok": False, "outcome": type(e).__name__, "timings": None,
+                        "latency_ms": (time.perf_counter() - start) * 1000}
+
+    start = time.perf_counter()
+    samples = await asyncio.gather(*(one(index, query) for index, query in enumerate(queries)))
+    return list(samples), time.perf_counter() - start
+
+
+async def run_api_levels(args, queries: List[str], stub_config) -> List[Dict]:
+    import httpx
+
+    results = []
+    timeout = httpx.Timeout(600.0)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout) as client:
+            for concurrency in args.concurrency:
+                await run_api(client, queries[:args.warmup], concurrency, args.k)
+                samples, wall = await run_api(client, queries, concurrency, args.k)
+                results.append(summarize("api", concurrency, samples, wall, None))
+                print_row(results[-1])
+        return results
+
+    # In-process app, including its lifespan warm-up
+    import api
+    async with api.lifespan(api.app):
+        await api.app.state.ready.wait()
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark",
+                                     timeout=timeout) as client:
+            for concurrency in args.concurrency:
+                await run_api(client, queries[:args.warmup], concurrency, args.k)
+                calls_before = stub_config.requests if stub_config else None
+                samples, wall = await run_api(client, queries, concurrency, args.k)
+                llm_calls = stub_config.requests - calls_before if stub_config else None
+                results.append(summarize("api", concurrency, samples, wall, llm_calls))
+                print_row(results[-1])
+    return results
+
+
+def print_row(result: Dict):
+    latency = result["latency_ms"]
+    print(
+        f"   {result['target']:<8} c={result['concurrency']:<3} "
+        f"qps={result['qps'] or 0:>7.2f}  "
+        f"p50={latency['p50'] or 0:>8.1f}ms  p95={latency['p95'] or 0:>8.1f}ms  "
+        f"p99={latency['p99'] or 0:>8.1f}ms  errors={result['errors']}"
+    )
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark QueryHandler and the API against a stub Ollama")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Query file (.txt, or .jsonl with query/title)")
+    parser.add_argument("--target", choices=["handler", "api", "both"], default="both")
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, help="Requests per level (default: 2x the corpus)")
+    parser.add_argument("--warmup", type=int, default=2, help="Unrecorded requests before each level")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--with-caches", action="store_true",
+                        help="Keep the semantic and routing caches on (off by default - the corpus repeats)")
+    parser.add_argument("--ollama-url", help="Use this Ollama instead of the stub")
+    parser.add_argument("--url", help="Load-test a running API server instead of the in-process app")
+    parser.add_argument("--prompt-latency", type=float, default=0.2, help="Stub: seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="Stub: seconds per token")
+    parser.add_argument("--tokens", type=int, default=64, help="Stub: tokens per answer")
+    parser.add_argument("--output", help=f"Result file (default: {DEFAULT_OUTPUT_DIR}/benchmark-<timestamp>.json)")
+    args = parser.parse_args()
+    args.concurrency = [int(level) for level in args.concurrency.split(",")]
+
+    corpus = load_corpus(args.corpus)
+    total = args.requests or len(corpus) * 2
+    queries = [corpus[i % len(corpus)] for i in range(total)]
+
+    # Configure the process before anything reads the environment
+    stub_config = None
+    if not args.with_caches:
+        os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+        os.environ["ROUTING_CACHE_ENABLED"] = "false"
+    if args.ollama_url:
+        os.environ["OLLAMA_BASE_URL"] = args.ollama_url
+    elif not args.url:
+        from stub_ollama import StubConfig, start_stub_server
+        stub_config = StubConfig(
+            prompt_latency=args.prompt_latency,
+            token_latency=args.token_latency,
+            tokens=args.tokens
+        )
+        _, stub_url = start_stub_server(stub_config)
+        os.environ["OLLAMA_BASE_URL"] = stub_url
+        print(f"🧪 Stub Ollama on {stub_url}")
+
+    print(f"📊 {total} requests per level from {args.corpus} ({len(corpus)} queries)")
+    runs = []
+
+    if args.target in ("handler", "both") and not args.url:
+        from query_handler import QueryHandler
+        handler = QueryHandler(llm_model=os.getenv("LLM_MODEL", "mistral"))
+        for concurrency in args.concurrency:
+            run_handler(handler, queries[:args.warmup], concurrency, args.k)
+            calls_before = stub_config.requests if stub_config else None
+            samples, wall = run_handler(handler, queries, concurrency, args.k)
+            llm_calls = stub_config.requests - calls_before if stub_config else None
+            runs.append(summarize("handler", concurrency, samples, wall, llm_calls))
+            print_row(runs[-1])
+
+    if args.target in ("api", "both"):
+        runs.extend(asyncio.run(run_api_levels(args, queries, stub_config)))
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "corpus": args.corpus,
+        "config": {
+            "requests_per_level": total,
+            "k": args.k,
+            "with_caches": args.with_caches,
+            "llm": "external" if (args.ollama_url or args.url) else "stub",
+            "stub_prompt_latency": args.prompt_latency,
+            "stub_token_latency": args.token_latency,
+            "stub_tokens": args.tokens,
+            "env": {
+                name: os.environ[name] for name in sorted(os.environ)
+                if name.startswith(("LLM_", "ROUTING_", "ROUTER_", "RETRIEVAL", "COMPARISON_",
+                                    "SEMANTIC_CACHE", "FAST_PATH", "EMBEDDING_CACHE", "VECTORSTORE",
+                                    "HYBRID_", "SECTION_STORE"))
+            }
+        },
+        "runs": runs
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs(DEFAULT_OUTPUT_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(DEFAULT_OUTPUT_DIR, f"benchmark-{stamp}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Centroid Classifier
+Classifies query embeddings against per-section and per-album centroids
+built from the ingested chunks
+"""
+from collections import defaultdict
+from typing import Dict, List, Tuple
+import numpy as np
+
+
+class CentroidClassifier:
+    """Sub-millisecond section/album classification by cosine similarity to centroids"""
+
+    def __init__(self, section_centroids: Dict[str, np.ndarray],
+                 album_centroids: Dict[str, np.ndarray], temperature: float = 0.05):
+        """
+        Args:
+            section_centroids: section name -> mean chunk embedding
+            album_centroids: album name -> mean chunk embedding
+            temperature: Softmax temperature turning cosine similarities into
+                confidences (lower = sharper); tune against labelled queries
+        """
+        self.temperature = temperature
+        self.section_labels, self._section_matrix = self._stack(section_centroids)
+        self.album_labels, self._album_matrix = self._stack(album_centroids)
+
+    @classmethod
+    def from_vectorstore(cls, db, temperature: float = 0.05) -> "CentroidClassifier":
+        """Build centroids from every chunk embedding stored in a Chroma collection"""
+        data = db.get(include=["embeddings", "metadatas"])
+        embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+        metadatas = data["metadatas"]
+
+        section_rows = defaultdict(list)
+        album_rows = defaultdict(list)
+        for row, metadata in enumerate(metadatas):
+            metadata = metadata or {}
+            if metadata.get("section"):
+                section_rows[metadata["section"]].append(row)
+            if metadata.get("album"):
+                album_rows[metadata["album"]].append(row)
+
+        section_centroids = {label: embeddings[rows].mean(axis=0) for label, rows in section_rows.items()}
+        album_centroids = {label: embeddings[rows].mean(axis=0) for label, rows in album_rows.items()}
+        return cls(section_centroids, album_centroids, temperature=temperature)
+
+    def classify_sections(self, query_vector: List[float]) -> List[Tuple[str, float]]:
+        """Sections ranked by calibrated confidence (probabilities sum to 1)"""
+        return [(label, probability) for label, probability, _
+                in self.score_sections(query_vector)]
+
+    def classify_albums(self, query_vector: List[float]) -> List[Tuple[str, float]]:
+        """Albums ranked by calibrated confidence (probabilities sum to 1)"""
+        return [(label, probability) for label, probability, _
+                in self._score(query_vector, self.album_labels, self._album_matrix)]
+
+    def score_sections(self, query_vector: List[float]) -> List[Tuple[str, float, float]]:
+        """Sections ranked as (label, confidence, cosine similarity to the centroid)"""
+        return self._score(query_vector, self.section_labels, self._section_matrix)
+
+    def _score(self, query_vector: List[float], labels: List[str],
+               matrix: np.ndarray) -> List[Tuple[str, float, float]]:
+        if not labels:
+            return []
+        query_vec = self._normalize(np.asarray(query_vector, dtype=np.float32))
+        similarities = matrix @ query_vec
+
+        # Temperature-scaled softmax over cosine similarities
+        logits = (similarities - similarities.max()) / self.temperature
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum()
+
+        order = np.argsort(-probabilities)
+        return [(labels[i], float(probabilities[i]), float(similarities[i])) for i in order]
+
+    @classmethod
+    def _stack(cls, centroids: Dict[str, np.ndarray]):
+        labels = sorted(centroids)
+        if not labels:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        matrix = np.stack([cls._normalize(np.asarray(centroids[label], dtype=np.float32))
+                           for label in labels])
+        return labels, matrix
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.where(norms > 0, norms, 1.0)
@@ -0,0 +1,172 @@
+"""
+Context Builder
+Assembles retrieved chunks into prompt context under a token budget
+
+Chunks overlap by the splitter's chunk_overlap and the same text can be
+retrieved more than once, so before prompting:
+    - duplicates and chunks contained in already-selected text are dropped
+    - overlapping chunks are merged into one passage (the shared text kept once)
+    - passages are put back in document order (source, chunk_index)
+    - each album/section group is capped at a token budget, filled in relevance order
+      (enumerations such as the tracklist are never cut - counts need every item)
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+class ContextBuilder:
+    """Dedupes, merges and trims retrieved documents before they reach the prompt"""
+
+    # Rough characters per token for English prose (Mistral/Llama tokenizers)
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, section_tokens: int = 800, max_tokens: int = 3000,
+                 min_overlap: int = 20, max_overlap: int = 1000):
+        """
+        Args:
+            section_tokens: Budget for one album/section group
+            max_tokens: Budget for the whole prompt context, split across groups
+            min_overlap: Shortest shared text treated as chunk overlap
+            max_overlap: Longest overlap searched for (>= the splitter's chunk_overlap)
+        """
+        self.section_tokens = section_tokens
+        self.max_tokens = max_tokens
+        self.min_overlap = min_overlap
+        self.max_overlap = max_overlap
+
+    def group_budget(self, groups: int) -> int:
+        """Token budget for each of `groups` album/section groups"""
+        return min(self.section_tokens, self.max_tokens // max(groups, 1))
+
+    def assemble(self, docs: List, max_tokens: Optional[int] = None) -> List[str]:
+        """
+        Passages for one album/section group
+
+        Args:
+            docs: Documents in relevance order (best first)
+            max_tokens: Group budget (default: section_tokens)
+
+        Returns:
+            Passage texts in document order
+        """
+        budget_chars = (self.section_tokens if max_tokens is None else max_tokens) * self.CHARS_PER_TOKEN
+        passages = []
+        used = 0
+
+        for rank, doc in enumerate(docs):
+            text = doc.page_content.strip()
+            if not text or any(text in passage["text"] for passage in passages):
+                continue
+
+            position = self._position(doc)
+            merged = self._merge(passages, text, position)
+            added = merged if merged is not None else len(text)
+
+            if used + added > budget_chars and doc.metadata.get("type") != "enumeration":
+                if passages:
+                    # Undo a merge that overshot and stop - later chunks are less relevant
+                    if merged is not None:
+                        self._unmerge(passages)
+                    break
+                # Always keep something: trim the best chunk to the budget
+                text = self._truncate(text, budget_chars)
+                added = len(text)
+
+            if merged is None:
+                passages.append({"text": text, "rank": rank, "position": position, "history": []})
+            used += added
+
+        for passage in passages:
+            passage.pop("history")
+        if passages and all(passage["position"] is not None for passage in passages):
+            passages.sort(key=lambda passage: passage["position"])
+        else:
+            passages.sort(key=lambda passage: passage["rank"])
+        return [passage["text"] for passage in passages]
+
+    def build(self, docs: List) -> str:
+        """Context for a flat result list: grouped by album/section, each group budgeted"""
+        groups: Dict[Tuple[str, str], List] = OrderedDict()
+        for doc in docs:
+            key = (doc.metadata.get("album", ""), doc.metadata.get("section", ""))
+            groups.setdefault(key, []).append(doc)
+
+        budget = self.group_budget(len(groups))
+        parts = []
+        for group_docs in groups.values():
+            parts.extend(self.assemble(group_docs, budget))
+        return "\n\n".join(parts)
+
+    @classmethod
+    def estimate_tokens(cls, text: str) -> int:
+        return len(text) // cls.CHARS_PER_TOKEN
+
+    def _merge(self, passages: List[Dict], text: str, position) -> Optional[int]:
+        """
+        Attach text to a passage it overlaps with
+
+        Returns:
+            Characters added, or None when the text overlaps no passage
+        """
+        for passage in passages:
+            current = passage["text"]
+            if current in text:
+                passage["history"].append((current, passage["position"]))
+                passage["text"] = text
+                passage["position"] = position
+                passages.append(passages.pop(passages.index(passage)))
+                return len(text) - len(current)
+
+            overlap = self._overlap(current, text)
+            if overlap:
+                passage["history"].append((current, passage["position"]))
+                passage["text"] = current + text[overlap:]
+                passages.append(passages.pop(passages.index(passage)))
+                return len(text) - overlap
+
+            overlap = self._overlap(text, current)
+            if overlap:
+                passage["history"].append((current, passage["position"]))
+                passage["text"] = text + current[overlap:]
+                passage["position"] = position
+                passages.append(passages.pop(passages.index(passage)))
+                return len(text) - overlap
+        return None
+
+    @staticmethod
+    def _unmerge(passages: List[Dict]):
+        """Revert the most recent merge (the merged passage is moved to the end)"""
+        passage = passages[-1]
+        passage["text"], passage["position"] = passage["history"].pop()
+
+    def _overlap(self, left: str, right: str) -> int:
+        """Length of the longest suffix of left that is a prefix of right (0 below min_overlap)"""
+        if len(left) < self.min_overlap or len(right) < self.min_overlap:
+            return 0
+        probe = right[:self.min_overlap]
+        start = left.find(probe, max(0, len(left) - min(len(right), self.max_overlap)))
+        # The earliest candidate start is the longest overlap
+        while start != -1:
+            if right.startswith(left[start:]):
+                return len(left) - start
+            start = left.find(probe, start + 1)
+        return 0
+
+    @staticmethod
+    def _position(doc):
+        metadata = doc.metadata or {}
+        if metadata.get("chunk_index") is None:
+            return None
+        return (metadata.get("source", ""), metadata["chunk_index"])
+
+    @staticmethod
+    def _truncate(text: str, max_chars: int) -> str:
+        """Cut at the last sentence end that fits, else at a word boundary"""
+        if len(text) <= max_chars:
+            return text
+        cut = text[:max_chars]
+        sentence_end = max(cut.rfind(". "), cut.rfind(".\n"))
+        if sentence_end > max_chars // 2:
+            return cut[:sentence_end + 1]
+        space = cut.rfind(" ")
+        return cut[:space] if space > 0 else cut
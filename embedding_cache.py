@@ -0,0 +1,232 @@
+"""
+Persistent Embedding Cache
+Content-addressed store of embeddings in front of the embedding model
+
+Layout of a store directory:
+    meta.json    - vector dimension
+    keys.txt     - one content hash per line, line i <-> row i
+    vectors.f32  - memory-mapped float32 matrix (capacity x dim)
+    lock         - taken by writers, so several processes can append safely
+
+Document embeddings are persisted; query embeddings are kept in a bounded
+in-memory LRU only, so serving traffic never grows the store.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows - single-writer only
+    fcntl = None
+
+
+class EmbeddingStore:
+    """Append-only, memory-mapped float32 matrix indexed by content hash"""
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, directory: str, readonly: bool = False):
+        """
+        Args:
+            directory: Store location (created on first write)
+            readonly: Serve lookups only - new vectors are not persisted
+        """
+        self.directory = directory
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        self._index = {}
+        self._rows = 0
+        self._keys_offset = 0
+        self._dim = None
+        self._vectors = None
+        self._capacity = 0
+
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._keys_path = os.path.join(directory, "keys.txt")
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._lock_path = os.path.join(directory, "lock")
+        with self._lock:
+            self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """Vectors for the given keys (None where missing)"""
+        with self._lock:
+            if any(key not in self._index for key in keys):
+                # Another process may have appended them since
+                self._refresh()
+            return [
+                np.array(self._vectors[self._index[key]]) if key in self._index else None
+                for key in keys
+            ]
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]):
+        """Append vectors for keys that are not stored yet"""
+        if self.readonly or not keys:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, self._file_lock():
+            # Rows are assigned from the file, not from what this process has seen
+            self._refresh()
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._index:
+                    new.setdefault(key, vector)
+            if not new:
+                return
+
+            if self._dim is None:
+                self._init_store(len(next(iter(new.values()))))
+            self._ensure_capacity(self._rows + len(new))
+
+            start = self._rows
+            for offset, vector in enumerate(new.values()):
+                self._vectors[start + offset] = np.asarray(vector, dtype=np.float32)
+            self._vectors.flush()
+
+            # Keys are written after their rows, so a crash never indexes a missing vector
+            with open(self._keys_path, "ab") as f:
+                f.write("".join(key + "\n" for key in new).encode("utf-8"))
+            self._refresh()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared by every process writing to the directory"""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Pick up keys (and file growth) appended since the last read - by any process"""
+        if self._dim is None:
+            if not os.path.exists(self._meta_path):
+                return
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self._dim = json.load(f)["dim"]
+
+        capacity = os.path.getsize(self._vectors_path) // (self._dim * 4)
+        if capacity != self._capacity:
+            self._vectors = None
+            self._capacity = capacity
+            self._open_vectors()
+
+        if os.path.getsize(self._keys_path) == self._keys_offset:
+            return
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read()
+        # A writer may be mid-line; only whole lines are indexed
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.decode("utf-8").splitlines():
+            key = line.strip()
+            if key and self._rows < self._capacity:
+                self._index.setdefault(key, self._rows)
+            self._rows += 1
+        self._keys_offset += len(complete)
+
+    def _init_store(self, dim: int):
+        self._dim = dim
+        with open(self._meta_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": dim}, f)
+        open(self._keys_path, "a").close()
+        open(self._vectors_path, "a").close()
+        self._ensure_capacity(self.INITIAL_CAPACITY)
+
+    def _ensure_capacity(self, rows: int):
+        """Grow the backing file (doubling) and remap it"""
+        if rows <= self._capacity:
+            return
+        capacity = max(self._capacity, self.INITIAL_CAPACITY)
+        while capacity < rows:
+            capacity *= 2
+
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_path, "r+b") as f:
+            f.truncate(capacity * self._dim * 4)
+        self._capacity = capacity
+        self._open_vectors()
+
+    def _open_vectors(self):
+        if self._capacity == 0:
+            return
+        self._vectors = np.memmap(
+            self._vectors_path,
+            dtype=np.float32,
+            mode="r" if self.readonly else "r+",
+            shape=(self._capacity, self._dim)
+        )
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that never re-embeds text it has seen before"""
+
+    def __init__(self, base: Embeddings, store: EmbeddingStore, namespace: str,
+                 query_cache_size: int = 1024):
+        """
+        Args:
+            base: The real embedding model
+            store: Persistent vector store (document embeddings)
+            namespace: Model identifier mixed into every key
+            query_cache_size: Query embeddings kept in memory (LRU, never persisted)
+        """
+        self.base = base
+        self.store = store
+        self.namespace = namespace
+        self.query_cache_size = query_cache_size
+        self._queries = OrderedDict()
+        self._queries_lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.lookup_documents(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.base.embed_documents([texts[i] for i in missing])
+            self.store_documents([texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = list(vector)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._queries_lock:
+            if text in self._queries:
+                self._queries.move_to_end(text)
+                return list(self._queries[text])
+        vector = list(self.base.embed_query(text))
+        if self.query_cache_size > 0:
+            with self._queries_lock:
+                self._queries[text] = vector
+                self._queries.move_to_end(text)
+                while len(self._queries) > self.query_cache_size:
+                    self._queries.popitem(last=False)
+        return list(vector)
+
+    def lookup_documents(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached document vectors (None where the text has not been embedded)"""
+        found = self.store.get_many([self._key("document", text) for text in texts])
+        return [vector.tolist() if vector is not None else None for vector in found]
+
+    def store_documents(self, texts: List[str], vectors: List[List[float]]):
+        """Persist document vectors computed elsewhere (e.g. in a process pool)"""
+        self.store.put_many([self._key("document", text) for text in texts], vectors)
+
+    def _key(self, kind: str, text: str) -> str:
+        raw = f"{self.namespace}\x1f{kind}\x1f{text}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
@@ -2,7 +2,7 @@ import { useState } from 'react'
 import './App.css'
 import QueryInput from './components/QueryInput'
 import AnswerDisplay from './components/AnswerDisplay'
-import { queryAPI } from './services/api'
+import { streamQueryAPI } from './services/api'
 
 function App() {
   const [answer, setAnswer] = useState(null)
@@ -16,11 +16,15 @@ function App() {
     setAnswer(null)
 
     try {
-      const response = await queryAPI(query, 10)
-      setAnswer({
-        query: response.query,
-        answer: response.answer,
-        routing: response.routing
+      await streamQueryAPI(query, 10, {
+        onRouting: (routing) => {
+          setAnswer({ query, answer: '', routing })
+        },
+        onToken: (token, answerSoFar) => {
+          // First token ends the loading state
+          setLoading(false)
+          setAnswer(prev => ({ ...prev, answer: answerSoFar }))
+        }
       })
       setQueryHistory(prev => [...prev, query])
     } catch (err) {
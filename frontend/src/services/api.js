@@ -24,6 +24,74 @@ export const queryAPI = async (query, k = 10) => {
     }
 }
 
+// Parse one Server-Sent Events frame into { event, data }
+const parseSSEFrame = (frame) => {
+    let event = 'message'
+    const dataLines = []
+    for (const line of frame.split('\n')) {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim()
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim())
+        }
+    }
+    if (dataLines.length === 0) return null
+    return { event, data: JSON.parse(dataLines.join('\n')) }
+}
+
+// Stream a query: routing arrives first, then answer tokens as they are generated
+export const streamQueryAPI = async (query, k = 10, { onRouting, onToken } = {}) => {
+    try {
+        const response = await fetch(`${API_BASE_URL}/api/query/stream`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
+            },
+            body: JSON.stringify({ query, k }),
+        })
+
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({}))
+            throw new Error(errorData.detail || `HTTP error! status: ${response.status}`)
+        }
+
+        const reader = response.body.getReader()
+        const decoder = new TextDecoder()
+        const result = { query, answer: '', routing: null }
+        let buffer = ''
+
+        while (true) {
+            const { value, done } = await reader.read()
+            if (done) break
+            buffer += decoder.decode(value, { stream: true })
+
+            // Frames are separated by a blank line
+            let boundary
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const frame = parseSSEFrame(buffer.slice(0, boundary))
+                buffer = buffer.slice(boundary + 2)
+                if (!frame) continue
+
+                if (frame.event === 'routing') {
+                    result.routing = frame.data
+                    onRouting?.(frame.data)
+                } else if (frame.event === 'token') {
+                    result.answer += frame.data.token
+                    onToken?.(frame.data.token, result.answer)
+                } else if (frame.event === 'error') {
+                    throw new Error(frame.data.detail)
+                }
+            }
+        }
+
+        return result
+    } catch (error) {
+        console.error('Streaming API Error:', error)
+        throw error
+    }
+}
+
 export const healthCheck = async () => {
     try {
         const response = await fetch(`${API_BASE_URL}/health`)
@@ -0,0 +1,54 @@
+"""
+Gunicorn config for multi-worker serving
+Usage: gunicorn -c gunicorn.conf.py api:app
+
+The master loads the embedding weights once (preload) and forks workers that
+share them copy-on-write. Each worker opens its own Chroma client and Ollama
+connection after the fork; with VECTORSTORE_MODE=snapshot they all open the
+single snapshot the master took.
+"""
+import multiprocessing
+import os
+
+# Workers (default: one per core)
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn_worker.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Import the app (and load model weights) in the master before forking
+preload_app = True
+
+# LLM answers can take a while on CPU
+timeout = int(os.getenv("WORKER_TIMEOUT", "300"))
+graceful_timeout = 30
+keepalive = 5
+
+# Workers only read the embedding cache - concurrent appends would corrupt it
+os.environ.setdefault("EMBEDDING_CACHE_READONLY", "true")
+
+
+def on_starting(server):
+    """Master: load embedding weights (and the snapshot) once so workers inherit them"""
+    import resources
+    resources.preload()
+    server.log.info(f"Preloaded embedding model, forking {workers} workers")
+
+
+def post_fork(server, worker):
+    """Worker: split the cores between workers and drop any pre-fork connections"""
+    import resources
+    resources.reset(keep_embeddings=True)
+
+    try:
+        import torch
+        threads = int(os.getenv("TORCH_THREADS", "0")) or max(1, multiprocessing.cpu_count() // workers)
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def child_exit(server, worker):
+    """Drop a dead worker's metric files (PROMETHEUS_MULTIPROC_DIR mode)"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,492 @@
+"""
+Incremental Ingestion Engine
+Manifest-driven, idempotent ingestion of album sections into the Chroma DB
+
+- Chunks get content-hash IDs, so re-ingesting never duplicates them
+- Files are skipped when their mtime/hash and their manifest entry and
+  splitter settings are unchanged since the last run
+- Changed files upsert their chunks and delete the ones that disappeared
+- Changed files are streamed: read incrementally, split, embedded in large
+  batches (optionally across a process pool) and written to Chroma in bulk,
+  so peak memory is bounded by the batch size rather than the corpus
+
+Usage:
+    python ingestion.py                      # ingest everything in the manifest
+    python ingestion.py --album "The Link"   # one album
+    python ingestion.py --force              # re-ingest even unchanged files
+    python ingestion.py --workers 4          # embed across 4 processes
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from embedding_cache import CachedEmbeddings
+from resources import EMBEDDING_MODEL, INGEST_STATE_FILE, get_vectorstore, vectorstore_lock
+
+DEFAULT_MANIFEST = "ingest_manifest.json"
+
+# Per-process embedder for pooled embedding (set by _init_embedding_worker)
+_worker_embeddings = None
+
+
+def _init_embedding_worker(model_name: str):
+    """Process pool initializer - load the embedding model once per worker"""
+    global _worker_embeddings
+    from langchain_huggingface import HuggingFaceEmbeddings
+    _worker_embeddings = HuggingFaceEmbeddings(model_name=model_name)
+
+
+def _embed_batch_in_worker(texts: List[str]) -> List[List[float]]:
+    return _worker_embeddings.embed_documents(texts)
+
+
+def load_manifest(path: str = DEFAULT_MANIFEST) -> Dict:
+    """Load the album -> directory -> file -> section manifest"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def file_sha256(path: str) -> str:
+    """Content hash of a source file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_text_chunks(path: str, splitter: RecursiveCharacterTextSplitter,
+                     block_size: int = 1 << 16) -> Iterator[str]:
+    """
+    Stream a text file as chunks without loading it whole
+
+    Yields exactly what splitter.split_text() returns for the whole file. The
+    splitter cuts the text at its top separator (the first one present in the
+    file) and merges the pieces greedily, so splitting again from a chunk that
+    starts on such a cut continues exactly as the whole-file split. Blocks are
+    appended to a buffer, the chunks before the last safe restart point are
+    emitted, and the raw text from that point on is carried over.
+    """
+    separator = _top_separator(path, splitter, block_size)
+    window = max(block_size, splitter._chunk_size * 8)
+    buffer = ""
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            buffer += block
+            if len(buffer) < window or separator is None:
+                continue
+
+            chunks = splitter.split_text(buffer)
+            restart = _restart_point(buffer, chunks, separator)
+            if restart is None:
+                continue
+            index, offset = restart
+            yield from chunks[:index]
+            buffer = buffer[offset:]
+
+    if buffer.strip():
+        yield from splitter.split_text(buffer)
+
+
+def _top_separator(path: str, splitter: RecursiveCharacterTextSplitter,
+                   block_size: int) -> Optional[str]:
+    """
+    The separator split_text() starts with for this file
+
+    Returns:
+        The separator, or None when there is no safe restart point (regex
+        separators, or text with none of them) and the file is split whole
+    """
+    if splitter._is_separator_regex:
+        return None
+    candidates = [separator for separator in splitter._separators if separator]
+    if not candidates:
+        return None
+    keep = max(len(separator) for separator in candidates) - 1
+    found = set()
+    tail = ""
+    with open(path, "r", encoding="utf-8") as f:
+        for block in iter(lambda: f.read(block_size), ""):
+            # The tail catches separators spanning two blocks
+            text = tail + block
+            found.update(separator for separator in candidates if separator in text)
+            if candidates[0] in found:
+                break
+            tail = text[-keep:] if keep else ""
+
+    for separator in splitter._separators:
+        if not separator:
+            return None
+        if separator in found:
+            return separator
+    return None
+
+
+def _restart_point(buffer: str, chunks: List[str], separator: str,
+                   candidates: int = 16) -> Optional[Tuple[int, int]]:
+    """
+    Latest chunk the split can restart from without changing its output
+
+    The chunk must start on a single top-level separator (the piece boundary
+    the whole-file split sees), end before the buffer's last piece, which the
+    block boundary may have cut short, and occur once in the buffer so its
+    offset is unambiguous.
+
+    Returns:
+        (chunk index, buffer offset of its separator), or None
+    """
+    last_piece = buffer.rfind(separator)
+    for index in range(len(chunks) - 1, max(len(chunks) - 1 - candidates, 0), -1):
+        chunk = chunks[index]
+        start = buffer.find(chunk)
+        if start == -1 or start + len(chunk) > last_piece or buffer.find(chunk, start + 1) != -1:
+            continue
+        gap_start = start
+        while gap_start > 0 and buffer[gap_start - 1].isspace():
+            gap_start -= 1
+        gap = buffer[gap_start:start]
+        if gap.count(separator) == 1:
+            return index, gap_start + gap.find(separator)
+    return None
+
+
+def chunk_id(album: str, section: str, source: str, content: str, occurrence: int) -> str:
+    """
+    Stable chunk ID derived from its content
+
+    Unchanged chunks keep their ID when text elsewhere in the file moves;
+    occurrence disambiguates identical chunks within one file.
+    """
+    raw = "\x1f".join([album, section, source, str(occurrence), content])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class IngestionEngine:
+    """Applies a manifest to the Chroma DB, touching only what changed"""
+
+    def __init__(self, manifest: Dict, db=None, batch_size: int = 256, workers: int = 0,
+                 write_batch_size: int = 1000):
+        """
+        Args:
+            manifest: Parsed ingestion manifest
+            db: Chroma store (default: the shared store for the manifest's directory)
+            batch_size: Chunks per embedding call
+            workers: Embedding processes (0/1 = embed in this process)
+            write_batch_size: Records per Chroma upsert
+        """
+        self.manifest = manifest
+        self.batch_size = batch_size
+        self.workers = workers
+        self.write_batch_size = write_batch_size
+        self.persist_directory = manifest.get("persist_directory", "gojiraDB")
+        # Always the live directory - never the serving snapshot, whatever VECTORSTORE_MODE says
+        self.db = db if db is not None else get_vectorstore(self.persist_directory, snapshot=False)
+
+        splitter_config = manifest.get("splitter", {})
+        self.splitter_config = {
+            "chunk_size": splitter_config.get("chunk_size", 500),
+            "chunk_overlap": splitter_config.get("chunk_overlap", 100)
+        }
+        self.splitter = RecursiveCharacterTextSplitter(**self.splitter_config)
+
+        self.state_path = os.path.join(self.persist_directory, INGEST_STATE_FILE)
+        self.state = self._load_state()
+
+    def run(self, albums: Optional[List[str]] = None, force: bool = False) -> Dict:
+        """
+        Ingest the selected albums (default: all in the manifest)
+
+        Returns:
+            Counter of files_updated, files_skipped, files_removed, chunks_written,
+            chunks_deleted, embedding_cache_hits plus timing (seconds,
+            pipeline_seconds, chunks_per_sec)
+        """
+        start = time.perf_counter()
+        stats = Counter()
+        selected = albums or list(self.manifest["albums"].keys())
+
+        # 1. Plan: find changed files (cheap - mtime, then a streamed hash)
+        plans = []
+        for album in selected:
+            album_config = self.manifest["albums"].get(album)
+            if album_config is None:
+                raise ValueError(f"Album not in manifest: {album}")
+
+            seen_keys = set()
+            for file_name, file_config in album_config["files"].items():
+                source = os.path.join(album_config["directory"], file_name)
+                key = self._state_key(album, source)
+                seen_keys.add(key)
+                plan = self._plan_file(album, source, key, file_config, force, stats)
+                if plan:
+                    plans.append(plan)
+
+            # Files dropped from the manifest lose their chunks too
+            for key in [k for k, v in self.state["files"].items()
+                        if v["album"] == album and k not in seen_keys]:
+                self._delete_ids(self.state["files"][key]["ids"], stats)
+                del self.state["files"][key]
+                self._save_state()
+                stats["files_removed"] += 1
+
+        # 2. Stream chunks -> embed -> write, a batch at a time
+        pipeline_start = time.perf_counter()
+        new_ids = {plan["key"]: [] for plan in plans}
+        pool = None
+        if self.workers > 1:
+            pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_embedding_worker,
+                initargs=(EMBEDDING_MODEL,)
+            )
+        try:
+            # Keep a few batches in flight so pool workers stay busy
+            in_flight = deque()
+            max_in_flight = max(self.workers, 1) * 2
+            for batch in self._iter_batches(plans, new_ids):
+                in_flight.append((batch, self._start_embedding(batch, pool, stats)))
+                if len(in_flight) >= max_in_flight:
+                    self._write_batch(*in_flight.popleft(), stats)
+            while in_flight:
+                self._write_batch(*in_flight.popleft(), stats)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        stats["pipeline_seconds"] = time.perf_counter() - pipeline_start
+
+        # 3. Retire stale chunks and record state per file
+        for plan in plans:
+            ids = new_ids[plan["key"]]
+            stale_ids = list(set(plan["replaced_ids"]) - set(ids))
+            self._delete_ids(stale_ids, stats)
+            self.state["files"][plan["key"]] = dict(plan["state"], ids=ids)
+            self._save_state()
+            stats["files_updated"] += 1
+            print(f"   ↻ {plan['album']} / {plan['section']}: "
+                  f"{len(ids)} chunks, {len(stale_ids)} removed")
+
+        stats["seconds"] = time.perf_counter() - start
+        if stats["chunks_written"]:
+            stats["chunks_per_sec"] = stats["chunks_written"] / stats["pipeline_seconds"]
+        return stats
+
+    def _plan_file(self, album: str, source: str, key: str, file_config: Dict,
+                   force: bool, stats: Counter) -> Optional[Dict]:
+        """Describe a changed file; returns None when it can be skipped"""
+        section = file_config["section"]
+        previous = self.state["files"].get(key)
+        mtime = os.path.getmtime(source)
+        # Section, type, split and splitter settings all shape the stored chunks
+        config = {"file": file_config, "splitter": self.splitter_config}
+        unchanged_config = previous is not None and previous.get("config") == config
+
+        if unchanged_config and not force and previous["mtime"] == mtime:
+            stats["files_skipped"] += 1
+            return None
+
+        content_hash = file_sha256(source)
+        if unchanged_config and not force and previous["sha256"] == content_hash:
+            # Touched but not modified
+            previous["mtime"] = mtime
+            self._save_state()
+            stats["files_skipped"] += 1
+            return None
+
+        if previous:
+            replaced_ids = previous["ids"]
+        else:
+            # First tracked run: drop untracked chunks from older ingestion scripts
+            replaced_ids = self._untracked_ids(album, section)
+
+        return {
+            "key": key,
+            "album": album,
+            "section": section,
+            "source": source,
+            "file_config": file_config,
+            "replaced_ids": replaced_ids,
+            "state": {
+                "album": album,
+                "section": section,
+                "source": source,
+                "mtime": mtime,
+                "sha256": content_hash,
+                "config": config
+            }
+        }
+
+    def _iter_batches(self, plans: List[Dict],
+                      new_ids: Dict[str, List[str]]) -> Iterator[List[Tuple[str, Document]]]:
+        """Group the streamed chunks of every planned file into embedding batches"""
+        batch = []
+        for plan in plans:
+            for doc_id, document in self._iter_documents(plan):
+                new_ids[plan["key"]].append(doc_id)
+                batch.append((doc_id, document))
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def _iter_documents(self, plan: Dict) -> Iterator[Tuple[str, Document]]:
+        """Stream one source file as (chunk ID, document) pairs"""
+        album, section, source = plan["album"], plan["section"], plan["source"]
+        file_config = plan["file_config"]
+
+        if file_config.get("split", True):
+            texts = iter_text_chunks(source, self.splitter)
+        else:
+            # Enumerations (e.g. tracklists) stay whole so counting works
+            with open(source, "r", encoding="utf-8") as f:
+                texts = iter([f.read()])
+
+        # Occurrences are counted by digest so long files don't keep every chunk text alive
+        occurrences = Counter()
+        for index, text in enumerate(texts):
+            digest = hashlib.sha1(text.encode("utf-8")).digest()
+            occurrences[digest] += 1
+            document = Document(
+                page_content=text,
+                metadata={
+                    "album": album,
+                    "section": section,
+                    "type": file_config.get("type", "prose"),
+                    "source": source,
+                    "chunk_index": index
+                }
+            )
+            yield chunk_id(album, section, source, text, occurrences[digest]), document
+
+    def _start_embedding(self, batch: List[Tuple[str, Document]], pool: Optional[ProcessPoolExecutor],
+                         stats: Counter) -> Callable[[], List[List[float]]]:
+        """
+        Begin embedding a batch, reusing cached vectors for unchanged content
+
+        Returns a callable that yields the batch's vectors once they are ready.
+        """
+        texts = [document.page_content for _, document in batch]
+        embeddings = self.db.embeddings
+        cache = embeddings if isinstance(embeddings, CachedEmbeddings) else None
+
+        vectors = cache.lookup_documents(texts) if cache else [None] * len(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        stats["embedding_cache_hits"] += len(texts) - len(missing)
+        if not missing:
+            return lambda: vectors
+
+        missing_texts = [texts[i] for i in missing]
+        if pool is not None:
+            pending = pool.submit(_embed_batch_in_worker, missing_texts).result
+        else:
+            model = cache.base if cache else embeddings
+            computed = model.embed_documents(missing_texts)
+            pending = lambda: computed
+
+        def finish() -> List[List[float]]:
+            computed_vectors = pending()
+            if cache:
+                cache.store_documents(missing_texts, computed_vectors)
+            for i, vector in zip(missing, computed_vectors):
+                vectors[i] = vector
+            return vectors
+
+        return finish
+
+    def _write_batch(self, batch: List[Tuple[str, Document]],
+                     finish: Callable[[], List[List[float]]], stats: Counter):
+        """Upsert one embedded batch into Chroma"""
+        vectors = finish()
+        for i in range(0, len(batch), self.write_batch_size):
+            part = slice(i, i + self.write_batch_size)
+            # Snapshots never see a half-written upsert
+            with vectorstore_lock(self.persist_directory):
+                self.db._collection.upsert(
+                    ids=[doc_id for doc_id, _ in batch[part]],
+                    embeddings=vectors[part],
+                    documents=[document.page_content for _, document in batch[part]],
+                    metadatas=[document.metadata for _, document in batch[part]]
+                )
+        stats["chunks_written"] += len(batch)
+
+    def _untracked_ids(self, album: str, section: str) -> List[str]:
+        """Chunk IDs for this album/section that no state entry owns"""
+        existing = self.db.get(
+            where={"$and": [{"album": album}, {"section": section}]},
+            include=[]
+        )["ids"]
+        owned = {chunk for entry in self.state["files"].values() for chunk in entry["ids"]}
+        return [chunk for chunk in existing if chunk not in owned]
+
+    def _delete_ids(self, ids: List[str], stats: Counter):
+        if ids:
+            with vectorstore_lock(self.persist_directory):
+                self.db.delete(ids=ids)
+            stats["chunks_deleted"] += len(ids)
+
+    @staticmethod
+    def _state_key(album: str, source: str) -> str:
+        return f"{album}::{source}"
+
+    def _load_state(self) -> Dict:
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"files": {}}
+
+    def _save_state(self):
+        """Write state atomically after every file so an interrupted run resumes cleanly"""
+        os.makedirs(self.persist_directory, exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+
+def run_ingestion(albums: Optional[List[str]] = None, manifest_path: str = DEFAULT_MANIFEST,
+                  force: bool = False, batch_size: Optional[int] = None,
+                  workers: Optional[int] = None) -> Dict:
+    """Load the manifest and ingest the selected albums"""
+    if batch_size is None:
+        batch_size = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+    if workers is None:
+        workers = int(os.getenv("EMBED_WORKERS", "0"))
+
+    engine = IngestionEngine(load_manifest(manifest_path), batch_size=batch_size, workers=workers)
+    stats = engine.run(albums=albums, force=force)
+
+    print(
+        f"✅ Ingestion complete in {stats['seconds']:.1f}s: "
+        f"{stats['files_updated']} files updated, {stats['files_skipped']} unchanged, "
+        f"{stats['files_removed']} removed, {stats['chunks_written']} chunks written, "
+        f"{stats['chunks_deleted']} chunks deleted"
+    )
+    if stats["chunks_written"]:
+        print(f"   ⚡ Pipeline throughput: {stats['chunks_per_sec']:.1f} chunks/sec "
+              f"(batch size {batch_size}, {max(workers, 1)} process(es), "
+              f"{stats['embedding_cache_hits']} served from the embedding cache)")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally ingest album data into Chroma")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="Path to the ingestion manifest")
+    parser.add_argument("--album", action="append", help="Album to ingest (repeatable, default: all)")
+    parser.add_argument("--force", action="store_true", help="Re-ingest files even if unchanged")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Chunks per embedding batch (default: $EMBED_BATCH_SIZE or 256)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Embedding processes (default: $EMBED_WORKERS or in-process)")
+    args = parser.parse_args()
+
+    run_ingestion(albums=args.album, manifest_path=args.manifest, force=args.force,
+                  batch_size=args.batch_size, workers=args.workers)
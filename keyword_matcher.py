@@ -0,0 +1,118 @@
+"""
+Keyword Matcher
+Word-level Aho-Corasick automaton for routing keywords
+"""
+import re
+from collections import defaultdict, deque
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class KeywordMatcher:
+    """
+    Multi-pattern matcher over word tokens
+
+    Patterns are whole words or phrases, so "live" never matches "delivered".
+    All patterns are found in a single left-to-right pass over the query tokens.
+
+    Matching rules:
+        - Queries and patterns are lowercased and split on anything that is not
+          a letter or digit, so "Mars-to-Sirius" and "mars to sirius" match alike
+        - A phrase matches only as consecutive whole tokens ("both albums")
+        - Overlapping patterns all match ("live" and "live performance" both
+          fire on "live performance")
+        - With plural=True the last word may take a trailing "s" ("song" -> "songs");
+          other inflections ("recorded", "reviewed") need their own pattern
+        - A label found more than once scores once per occurrence
+    """
+
+    TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Dict[Hashable, float]] = [{}]
+        self._built = False
+
+    def add(self, phrase: str, label: Hashable, weight: Optional[float] = None,
+            plural: bool = False):
+        """
+        Register a keyword or phrase
+
+        Args:
+            phrase: Keyword text (tokenized the same way as queries)
+            label: Value reported when the phrase matches (e.g. ("section", "tracklist"))
+            weight: Score contributed per match (default: number of words in the phrase)
+            plural: Also match the phrase with a trailing "s" on its last word
+        """
+        tokens = self.tokenize(phrase)
+        if not tokens:
+            return
+        weight = float(len(tokens)) if weight is None else weight
+
+        self._insert(tokens, label, weight)
+        if plural and not tokens[-1].endswith("s"):
+            self._insert(tokens[:-1] + [tokens[-1] + "s"], label, weight)
+        self._built = False
+
+    def build(self):
+        """Compute failure links (breadth-first) - call once after adding patterns"""
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+
+        while queue:
+            current = queue.popleft()
+            for token, child in self._goto[current].items():
+                queue.append(child)
+
+                fallback = self._fail[current]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+
+                # Inherit matches that end at the failure state
+                for label, weight in self._output[self._fail[child]].items():
+                    if weight > self._output[child].get(label, 0):
+                        self._output[child][label] = weight
+
+        self._built = True
+
+    def scan(self, text: str) -> List[Tuple[Hashable, float]]:
+        """Every (label, weight) match in the text, one linear pass"""
+        if not self._built:
+            self.build()
+
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        matches = []
+        for token in self.tokenize(text):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            if output[state]:
+                matches.extend(output[state].items())
+        return matches
+
+    def score(self, text: str) -> Dict[Hashable, float]:
+        """Summed match weights per label"""
+        scores = defaultdict(float)
+        for label, weight in self.scan(text):
+            scores[label] += weight
+        return dict(scores)
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        return cls.TOKEN_PATTERN.findall(text.lower())
+
+    def _insert(self, tokens: List[str], label: Hashable, weight: float):
+        state = 0
+        for token in tokens:
+            if token not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append({})
+                self._goto[state][token] = len(self._goto) - 1
+            state = self._goto[state][token]
+        if weight > self._output[state].get(label, 0):
+            self._output[state][label] = weight
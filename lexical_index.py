@@ -0,0 +1,181 @@
+"""
+Lexical Index
+In-process BM25 over the chunks stored in Chroma, for exact names and titles
+that embedding similarity misses
+
+Postings are kept in CSR form - one offsets array into flat chunk-row and
+term-frequency arrays - so a lookup is a few slices and vectorized adds.
+Rows line up with the Chroma ids the index was built from. Texts are not
+kept: hits are ids, resolved against Chroma by the caller, and metadata is
+kept only as integer-coded columns for filtering.
+"""
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from has have how in is it its of on or "
+    "that the their this to was were what when where which who why with".split()
+)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, accent-folded word tokens without stopwords"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [token for token in TOKEN_PATTERN.findall(text) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Sparse inverted index scored with Okapi BM25"""
+
+    def __init__(self, ids: List[str], texts: List[str], metadatas: List[Dict],
+                 k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            ids: Chroma ids, one per chunk
+            texts: Chunk texts
+            metadatas: Chunk metadata (album, section, ...) used for filtering
+            k1: Term-frequency saturation
+            b: Document length normalization
+        """
+        self.ids = list(ids)
+        self.k1 = k1
+        self.b = b
+        self._columns = self._build_columns([metadata or {} for metadata in metadatas])
+
+        self.vocabulary: Dict[str, int] = {}
+        term_ids, rows, counts = [], [], []
+        lengths = np.zeros(len(self.ids), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[row] = len(tokens)
+            for term, count in Counter(tokens).items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                rows.append(row)
+                counts.append(count)
+
+        # Group the (term, row, tf) triples by term
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        self._rows = np.asarray(rows, dtype=np.int32)[order]
+        self._tfs = np.asarray(counts, dtype=np.float32)[order]
+        document_frequency = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self._offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(document_frequency, out=self._offsets[1:])
+
+        n = max(len(self.ids), 1)
+        self._idf = np.log1p((n - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        # Per-chunk part of the BM25 denominator, computed once
+        average_length = float(lengths.mean()) if len(lengths) else 0.0
+        self._length_norm = (k1 * (1 - b + b * lengths / max(average_length, 1.0))).astype(np.float32)
+
+    @classmethod
+    def from_vectorstore(cls, db, **kwargs) -> "BM25Index":
+        """Index every chunk stored in a Chroma collection"""
+        data = db.get(include=["documents", "metadatas"])
+        return cls(data["ids"], data["documents"], data["metadatas"], **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the postings, scoring and metadata column arrays (ids and vocabulary not counted)"""
+        arrays = [self._rows, self._tfs, self._offsets, self._idf, self._length_norm]
+        arrays += [codes for _, codes in self._columns.values()]
+        return sum(array.nbytes for array in arrays)
+
+    def search(self, query: str, k: int, search_filter: Optional[Dict] = None) -> List[Tuple[int, float]]:
+        """
+        Top k chunks by BM25 score
+
+        Args:
+            query: Query text
+            k: Maximum number of results
+            search_filter: Chroma-style metadata filter ($and, $or, $eq, $ne, $in, $nin)
+
+        Returns:
+            (row, score) pairs, best first; chunks sharing no term are left out
+        """
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            rows, tfs = self._rows[start:end], self._tfs[start:end]
+            scores[rows] += self._idf[term_id] * tfs * (self.k1 + 1) / (tfs + self._length_norm[rows])
+
+        if search_filter:
+            scores[~self._mask(search_filter)] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(row), float(scores[row])) for row in candidates]
+
+    def _mask(self, search_filter: Dict) -> np.ndarray:
+        """Boolean row mask for a Chroma-style metadata filter"""
+        if "$and" in search_filter:
+            return np.logical_and.reduce([self._mask(part) for part in search_filter["$and"]])
+        if "$or" in search_filter:
+            return np.logical_or.reduce([self._mask(part) for part in search_filter["$or"]])
+
+        mask = np.ones(len(self.ids), dtype=bool)
+        for field, condition in search_filter.items():
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            codes_by_value, codes = self._column(field)
+            for operator, value in condition.items():
+                values = value if operator in ("$in", "$nin") else [value]
+                matches = np.isin(codes, [codes_by_value[v] for v in values if v in codes_by_value])
+                if operator in ("$eq", "$in"):
+                    mask &= matches
+                elif operator in ("$ne", "$nin"):
+                    mask &= ~matches
+                else:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+        return mask
+
+    def _column(self, field: str) -> Tuple[Dict, np.ndarray]:
+        """Metadata field as integer codes per row; a field no chunk has is all None"""
+        if field not in self._columns:
+            return {None: 0}, np.zeros(len(self.ids), dtype=np.int32)
+        return self._columns[field]
+
+    @staticmethod
+    def _build_columns(metadatas: List[Dict]) -> Dict[str, Tuple[Dict, np.ndarray]]:
+        """Every metadata field as (value -> code, per-row codes)"""
+        fields = sorted({field for metadata in metadatas for field in metadata})
+        columns = {}
+        for field in fields:
+            codes_by_value = {}
+            codes = np.asarray([
+                codes_by_value.setdefault(metadata.get(field), len(codes_by_value))
+                for metadata in metadatas
+            ], dtype=np.int32)
+            columns[field] = (codes_by_value, codes)
+        return columns
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """
+    Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank)
+
+    Args:
+        rankings: Id lists, each best first
+        k: Damping constant (60 in the original RRF paper)
+
+    Returns:
+        Ids ordered by fused score
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
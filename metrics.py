@@ -0,0 +1,193 @@
+"""
+Metrics
+Per-request stage timings plus process-wide Prometheus metrics
+
+A Trace collects the spans of one request (embed, route, search, generate,
+...). The active trace lives in a context variable, so code deep in the
+router or handler records into it without passing it around. Every span
+is also observed in a Prometheus histogram, whether a trace is active or not.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "Latency of each query pipeline stage",
+    ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+LLM_TOKENS = Counter(
+    "rag_llm_tokens_total",
+    "Tokens processed by Ollama",
+    ["kind"]
+)
+CONTEXT_CHARS = Histogram(
+    "rag_context_chars",
+    "Characters of retrieved context placed in answer prompts",
+    buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+)
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("rag_trace", default=None)
+
+
+class Trace:
+    """Stage spans and counters for a single request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, Dict] = {}
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"ms": 0.0, "count": 0})
+            entry["ms"] += seconds * 1000
+            entry["count"] += 1
+
+    def add(self, name: str, value: float):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> Dict:
+        """JSON-friendly view: total time, per-stage milliseconds and counters"""
+        with self._lock:
+            return {
+                "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+                "stages": {
+                    stage: {"ms": round(entry["ms"], 2), "count": entry["count"]}
+                    for stage, entry in self.stages.items()
+                },
+                **self.counters
+            }
+
+
+@contextmanager
+def trace():
+    """Start a trace for the current request (reuses one that is already active)"""
+    current = _current_trace.get()
+    if current is not None:
+        yield current
+        return
+
+    current = Trace()
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def activate(current: Optional[Trace]):
+    """Make an existing trace current for a block (e.g. between async generator yields)"""
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block as one pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def observe(stage: str, seconds: float):
+    """Record a stage duration measured elsewhere"""
+    STAGE_SECONDS.labels(stage=stage).observe(seconds)
+    current = _current_trace.get()
+    if current is not None:
+        current.record(stage, seconds)
+
+
+def count(name: str, value: float):
+    """Add to a per-request counter (tokens, context size, ...)"""
+    if name in ("prompt_tokens", "completion_tokens"):
+        LLM_TOKENS.labels(kind=name.split("_")[0]).inc(value)
+    elif name == "context_chars":
+        CONTEXT_CHARS.observe(value)
+
+    current = _current_trace.get()
+    if current is not None:
+        current.add(name, value)
+
+
+def record_generation_info(info: Optional[Dict]):
+    """Token counts from an Ollama generation_info payload"""
+    if not info:
+        return
+    if info.get("prompt_eval_count") is not None:
+        count("prompt_tokens", info["prompt_eval_count"])
+    if info.get("eval_count") is not None:
+        count("completion_tokens", info["eval_count"])
+
+
+class StatsCollector:
+    """
+    Exposes stats() dicts (caches, router tiers, LLM queue) as gauges at scrape time
+
+    The sources live in this process, so under gunicorn each scrape reports the
+    worker that served it; those gauges carry a pid label to tell workers apart.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Dict]] = {}
+
+    def register(self, name: str, source: Callable[[], Dict]):
+        self._sources[name] = source
+
+    def collect(self):
+        labels = {"pid": str(os.getpid())} if os.getenv("PROMETHEUS_MULTIPROC_DIR") else {}
+        for name, source in list(self._sources.items()):
+            try:
+                stats = source()
+            except Exception:
+                continue
+            for key, value in self._flatten(stats):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                gauge = GaugeMetricFamily(f"rag_{name}_{key}", f"{name} {key}", labels=list(labels))
+                gauge.add_metric(list(labels.values()), value)
+                yield gauge
+
+    @classmethod
+    def _flatten(cls, stats: Dict, prefix: str = ""):
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                yield from cls._flatten(value, f"{prefix}{key}_")
+            else:
+                yield f"{prefix}{key}", value
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def register_stats(name: str, source: Callable[[], Dict]):
+    """Publish a component's stats() as rag_<name>_<key> gauges"""
+    stats_collector.register(name, source)
+
+
+def render():
+    """Prometheus exposition payload and content type"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # gunicorn workers: aggregate the histograms every worker writes to disk;
+        # the stats gauges are this worker's own
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(stats_collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,65 @@
+"""
+Maximal Marginal Relevance
+Vectorized MMR selection with an adaptive relevance cutoff
+"""
+from typing import List
+import numpy as np
+
+
+def mmr_select(query_vector, candidates: np.ndarray, k: int, lambda_mult: float = 0.5,
+               min_relevance: float = 0.0, relevance_window: float = 1.0,
+               min_results: int = 1, max_redundancy: float = 0.95) -> List[int]:
+    """
+    Pick up to k diverse, relevant candidates
+
+    Each step takes the candidate maximizing
+        lambda * sim(query, c) - (1 - lambda) * max sim(c, already selected)
+    Candidates below the relevance cutoff are never taken, so fewer than k
+    come back when only a few chunks are actually relevant.
+
+    Args:
+        query_vector: Query embedding
+        candidates: (n, dim) candidate embeddings
+        k: Maximum number to select
+        lambda_mult: 1 = pure relevance, 0 = pure diversity
+        min_relevance: Absolute cosine similarity floor
+        relevance_window: Also drop candidates more than this below the best match
+        min_results: Always keep this many of the most relevant candidates
+        max_redundancy: Skip candidates at least this similar to a selected one
+            (near-duplicates, e.g. chunks ingested twice)
+
+    Returns:
+        Selected row indices, in selection order
+    """
+    if k <= 0 or len(candidates) == 0:
+        return []
+
+    matrix = _normalize(np.asarray(candidates, dtype=np.float32))
+    query = _normalize(np.asarray(query_vector, dtype=np.float32))
+    relevance = matrix @ query
+
+    cutoff = max(min_relevance, float(relevance.max()) - relevance_window)
+    eligible = relevance >= cutoff
+    if eligible.sum() < min_results:
+        eligible[np.argsort(-relevance)[:min_results]] = True
+
+    selected = []
+    redundancy = np.full(len(matrix), -np.inf, dtype=np.float32)
+    while len(selected) < k and eligible.any():
+        if selected:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        else:
+            scores = relevance.copy()
+        scores[~eligible] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        eligible[best] = False
+        # Similarity of every candidate to the newly selected one, in one matvec
+        redundancy = np.maximum(redundancy, matrix @ matrix[best])
+        eligible &= redundancy < max_redundancy
+    return selected
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
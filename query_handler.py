@@ -2,11 +2,28 @@
 Unified Query Handler
 Handles both single and comparison queries using the router
 """
+import asyncio
+import contextvars
 import os
-from typing import Dict, List
-from langchain_ollama import OllamaLLM
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List, Optional
+import numpy as np
 from langchain_chroma import Chroma
-from router import QueryRouter, create_db_connection
+from langchain_core.documents import Document
+import metrics
+from centroid_router import CentroidClassifier
+from context_builder import ContextBuilder
+from mmr import mmr_select
+from section_store import SectionStore
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from resources import (
+    INGEST_STATE_FILE, PERSIST_DIRECTORY, get_llm, get_llm_gate, get_vectorstore, snapshot_mode
+)
+from router import QueryRouter
+from semantic_cache import SemanticCache
 
 
 class QueryHandler:
@@ -15,10 +32,67 @@ class QueryHandler:
     def __init__(self, llm_model: str = "mistral"):
         """Initialize handler with router and LLM"""
         self.router = QueryRouter(llm_model=llm_model)
-        self.db = create_db_connection()
-        # Support environment variable for Ollama URL (useful for Docker)
-        ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-        self.llm = OllamaLLM(model=llm_model, base_url=ollama_base_url)
+        # Serving may read from a snapshot; ingestion always writes the live directory
+        self.snapshot = snapshot_mode()
+        self.db = get_vectorstore(snapshot=self.snapshot)
+        # Same client as the router - one connection pool to Ollama
+        self.llm = get_llm(llm_model)
+        # Bounded concurrency + FIFO queue in front of every Ollama call
+        self.llm_gate = get_llm_gate()
+        # Bounded pool for blocking Chroma searches on the async path
+        retrieval_workers = int(os.getenv("RETRIEVAL_WORKERS", "4"))
+        self.executor = ThreadPoolExecutor(
+            max_workers=retrieval_workers,
+            thread_name_prefix="retrieval"
+        )
+        # "batched" = one widened $in query per comparison, "concurrent" = parallel per-key queries
+        self.comparison_retrieval = os.getenv("COMPARISON_RETRIEVAL", "batched").lower()
+        # Per-key searches get their own pool - they may already run on self.executor
+        self._key_executor = None
+        if self.comparison_retrieval == "concurrent":
+            self._key_executor = ThreadPoolExecutor(
+                max_workers=retrieval_workers,
+                thread_name_prefix="retrieval-key"
+            )
+        # "similarity" = top k by similarity, "mmr" = over-fetch, then diverse
+        # selection that stops early at the relevance cutoff, "hybrid" = BM25
+        # and vector rankings fused with reciprocal rank fusion
+        self.retrieval_mode = os.getenv("RETRIEVAL_MODE", "similarity").lower()
+        self.mmr_fetch_multiplier = int(os.getenv("MMR_FETCH_MULTIPLIER", "3"))
+        self.mmr_lambda = float(os.getenv("MMR_LAMBDA", "0.5"))
+        self.min_relevance = float(os.getenv("RETRIEVAL_MIN_RELEVANCE", "0.2"))
+        self.relevance_window = float(os.getenv("RETRIEVAL_RELEVANCE_WINDOW", "0.15"))
+        self.hybrid_fetch_multiplier = int(os.getenv("HYBRID_FETCH_MULTIPLIER", "2"))
+        self.rrf_k = int(os.getenv("HYBRID_RRF_K", "60"))
+        # In-memory views of the collection, rebuilt when it changes: whole
+        # sections (enumerations and small sections skip vector search), the
+        # BM25 index for hybrid retrieval and the routing centroids
+        self.section_store = None
+        self.lexical_index = None
+        self.section_store_enabled = os.getenv("SECTION_STORE_ENABLED", "true").lower() == "true"
+        self.section_store_max_chars = int(os.getenv("SECTION_STORE_MAX_CHARS", "1500"))
+        # The collection is re-checked for changes at most this often (0 = every request)
+        self.collection_check_interval = float(os.getenv("COLLECTION_CHECK_INTERVAL", "5"))
+        self._fingerprint = None
+        self._fingerprint_checked = 0.0
+        self._views_fingerprint = None
+        self._views_lock = threading.Lock()
+        self._sync_collection_views()
+        # Semantic answer cache for near-duplicate questions
+        self.semantic_cache = None
+        if os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true":
+            self.semantic_cache = SemanticCache(
+                threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+                max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "256")),
+                ttl_seconds=float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+            )
+        # Dedupe/merge overlapping chunks and cap context tokens per album/section
+        self.context_builder = None
+        if os.getenv("CONTEXT_BUDGET_ENABLED", "true").lower() == "true":
+            self.context_builder = ContextBuilder(
+                section_tokens=int(os.getenv("CONTEXT_SECTION_TOKENS", "800")),
+                max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+            )
     
     def query(self, query: str, k: int = 10, verbose: bool = True) -> str:
         """
@@ -32,52 +106,393 @@ class QueryHandler:
         Returns:
             Generated response string
         """
-        # Route the query
-        routing = self.router.route_query(query)
+        return self.query_with_routing(query, k=k, verbose=verbose)["answer"]
+    
+    def query_with_routing(self, query: str, k: int = 10, verbose: bool = True,
+                           routing: Optional[Dict] = None) -> Dict:
+        """
+        Route and execute a query, returning the answer together with the routing used
+        
+        Args:
+            query: User's question
+            k: Number of documents to retrieve per section/album
+            verbose: Print routing information
+            routing: Precomputed routing result - skips the router and the semantic cache
+            
+        Returns:
+            {"answer": str, "routing": Dict, "cached": bool, "timings": Dict}
+        """
+        with metrics.trace() as trace:
+            result = self._query_with_routing(query, k, verbose, routing)
+        result["timings"] = trace.summary()
+        if verbose:
+            self._print_timings(result["timings"])
+        return result
+    
+    def _query_with_routing(self, query: str, k: int, verbose: bool,
+                            routing: Optional[Dict]) -> Dict:
+        # Embed once - the vector is shared by the answer cache and every search
+        # (deferred when nothing before retrieval needs it)
+        query_vector = self._embed_query(query) if self._needs_early_vector(routing) else None
+        
+        cache_key = None
+        if routing is None:
+            cache_key, cached = self._check_semantic_cache(query_vector, k)
+            if cached:
+                if verbose:
+                    print(f"\n⚡ Semantic cache hit (similarity {cached['similarity']:.3f})")
+                    self._print_routing(cached["routing"])
+                return {"answer": cached["answer"], "routing": cached["routing"], "cached": True}
+            
+            # Route the query (only if the caller hasn't already)
+            routing = self.router.route_query(query, query_vector)
         
         if verbose:
-            print(f"\n🔀 Routing Result:")
-            print(f"   Type: {routing['query_type']}")
-            print(f"   Sections: {routing['sections']}")
-            print(f"   Albums: {routing['albums']}")
-            print(f"   Confidence: {routing.get('confidence', 0):.2f}")
-            print(f"   Method: {routing.get('method', 'unknown')}\n")
+            self._print_routing(routing)
         
         # Execute retrieval based on routing
+        with metrics.span("retrieve"):
+            context = self._retrieve(query, query_vector, routing, k)
         if routing["query_type"] == "compare":
-            context = self._retrieve_for_comparison(query, routing, k)
             response = self._generate_comparison_response(query, context, routing)
         else:
-            context = self._retrieve_single_or_multi(query, routing, k)
             response = self._generate_single_response(query, context, routing)
         
-        return response
+        self._store_semantic_cache(cache_key, k, routing, response)
+        return {"answer": response, "routing": routing, "cached": False}
+    
+    async def aquery(self, query: str, k: int = 10, verbose: bool = False) -> str:
+        """Async version of query - safe to await from the FastAPI event loop"""
+        result = await self.aquery_with_routing(query, k=k, verbose=verbose)
+        return result["answer"]
+    
+    async def aquery_with_routing(self, query: str, k: int = 10, verbose: bool = False,
+                                  routing: Optional[Dict] = None) -> Dict:
+        """
+        Async version of query_with_routing
+        
+        LLM calls are awaited and Chroma searches run on the bounded retrieval
+        executor, so concurrent requests overlap instead of blocking each other.
+        """
+        with metrics.trace() as trace:
+            result = await self._aquery_with_routing(query, k, verbose, routing)
+        result["timings"] = trace.summary()
+        return result
+    
+    async def _aquery_with_routing(self, query: str, k: int, verbose: bool,
+                                   routing: Optional[Dict]) -> Dict:
+        query_vector = None
+        if self._needs_early_vector(routing):
+            query_vector = await self._run_blocking(self._embed_query, query)
+        
+        cache_key = None
+        if routing is None:
+            cache_key, cached = await self._run_blocking(self._check_semantic_cache, query_vector, k)
+            if cached:
+                return {"answer": cached["answer"], "routing": cached["routing"], "cached": True}
+            
+            routing = await self.router.aroute_query(query, query_vector)
+        
+        if verbose:
+            self._print_routing(routing)
+        
+        prompt = await self._abuild_prompt(query, query_vector, routing, k)
+        response = await self._agenerate(prompt)
+        
+        self._store_semantic_cache(cache_key, k, routing, response)
+        return {"answer": response, "routing": routing, "cached": False}
+    
+    async def astream_query(self, query: str, k: int = 10,
+                            routing: Optional[Dict] = None) -> AsyncIterator[Dict]:
+        """
+        Stream a query as events - the routing decision first, then answer tokens
+        
+        Yields:
+            {"event": "routing", "data": Dict} once, then
+            {"event": "token", "data": str} for each chunk Ollama produces, then
+            {"event": "timings", "data": Dict} with the stage timings
+        """
+        # Context variables do not survive across yields, so the trace is
+        # activated explicitly around each stretch of work between them
+        trace = metrics.Trace()
+        query_vector = None
+        if self._needs_early_vector(routing):
+            with metrics.activate(trace):
+                query_vector = await self._run_blocking(self._embed_query, query)
+        
+        cache_key = None
+        if routing is None:
+            with metrics.activate(trace):
+                cache_key, cached = await self._run_blocking(self._check_semantic_cache, query_vector, k)
+            if cached:
+                # Cached answers arrive as a single token
+                yield {"event": "routing", "data": cached["routing"]}
+                yield {"event": "token", "data": cached["answer"]}
+                yield {"event": "timings", "data": trace.summary()}
+                return
+            
+            with metrics.activate(trace):
+                routing = await self.router.aroute_query(query, query_vector)
+        
+        # A full LLM queue is reported before the first event, so it surfaces
+        # as a 429 status rather than mid-stream
+        self.llm_gate.check_capacity()
+        yield {"event": "routing", "data": routing}
+        
+        with metrics.activate(trace):
+            prompt = await self._abuild_prompt(query, query_vector, routing, k)
+        
+        # The slot is taken only once the prompt is ready, as in _agenerate,
+        # and held until the last token
+        with metrics.activate(trace):
+            await self.llm_gate.aacquire()
+        try:
+            tokens = []
+            start = time.perf_counter()
+            async for token in self.llm.astream(prompt):
+                if not tokens:
+                    metrics.observe("first_token", time.perf_counter() - start)
+                    trace.record("first_token", time.perf_counter() - start)
+                tokens.append(token)
+                yield {"event": "token", "data": token}
+        finally:
+            self.llm_gate.release()
+        
+        # Ollama streams roughly one token per chunk
+        metrics.observe("generate", time.perf_counter() - start)
+        trace.record("generate", time.perf_counter() - start)
+        with metrics.activate(trace):
+            metrics.count("completion_tokens", len(tokens))
+        
+        self._store_semantic_cache(cache_key, k, routing, "".join(tokens))
+        yield {"event": "timings", "data": trace.summary()}
+    
+    async def _abuild_prompt(self, query: str, query_vector: Optional[List[float]],
+                             routing: Dict, k: int) -> str:
+        """Retrieve context on the retrieval executor and build the matching prompt"""
+        with metrics.span("retrieve"):
+            context = await self._run_blocking(self._retrieve, query, query_vector, routing, k)
+        with metrics.span("prompt_build"):
+            if routing["query_type"] == "compare":
+                return self._build_comparison_prompt(query, context, routing)
+            return self._build_single_prompt(query, context, routing)
+    
+    def _needs_early_vector(self, routing: Optional[Dict]) -> bool:
+        """Whether the semantic cache or the centroid router needs the query embedding"""
+        return routing is None and (self.semantic_cache is not None or self.router.mode == "embedding")
+    
+    def _retrieve(self, query: str, query_vector: Optional[List[float]], routing: Dict, k: int):
+        """
+        Context for the routed query - a dict per album/section for comparisons,
+        a document list otherwise
+        
+        Sections the section store can serve whole skip embedding and vector search.
+        """
+        self._sync_collection_views()
+        section_context = self._section_context(routing)
+        if section_context is not None:
+            if routing["query_type"] == "compare":
+                return section_context
+            return [doc for docs in section_context.values() for doc in docs]
+        
+        if query_vector is None:
+            query_vector = self._embed_query(query)
+        if routing["query_type"] == "compare":
+            return self._retrieve_for_comparison(query, query_vector, routing, k)
+        return self._retrieve_single_or_multi(query, query_vector, routing, k)
+    
+    def _section_context(self, routing: Dict) -> Optional[Dict[str, List]]:
+        """Whole-section documents when every selected section is served by the store"""
+        if self.section_store is None:
+            return None
+        with metrics.span("section_store"):
+            return self.section_store.context_for(routing)
+    
+    def _sync_collection_views(self):
+        """(Re)build the section store, lexical index and centroids - at startup and after the collection changes"""
+        if not (self.section_store_enabled or self.retrieval_mode == "hybrid" or self.router.mode == "embedding"):
+            return
+        if self._views_fingerprint is not None and self._current_fingerprint() == self._views_fingerprint:
+            return
+        with self._views_lock:
+            fingerprint = self._current_fingerprint()
+            if fingerprint == self._views_fingerprint:
+                return
+            if self.section_store_enabled:
+                self.section_store = SectionStore.from_vectorstore(self.db, max_chars=self.section_store_max_chars)
+            if self.router.mode == "embedding":
+                self.router.centroid_classifier = CentroidClassifier.from_vectorstore(
+                    self.db,
+                    temperature=float(os.getenv("CENTROID_TEMPERATURE", "0.05"))
+                )
+            if self.retrieval_mode == "hybrid":
+                start = time.perf_counter()
+                self.lexical_index = BM25Index.from_vectorstore(self.db)
+                print(f"📚 BM25 index: {len(self.lexical_index)} chunks, "
+                      f"{len(self.lexical_index.vocabulary)} terms, "
+                      f"{self.lexical_index.nbytes / 1024:.0f} KiB "
+                      f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+            self._views_fingerprint = fingerprint
+    
+    def _run_blocking(self, func, *args):
+        """Run a blocking call on the retrieval executor, carrying the active trace along"""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.executor, contextvars.copy_context().run, func, *args)
+    
+    def _check_semantic_cache(self, query_vector: List[float], k: int):
+        """
+        Look up an embedded query in the semantic cache
+        
+        Returns:
+            (cache_key, cached_result) - cache_key is None when caching is disabled
+        """
+        if self.semantic_cache is None:
+            return None, None
+        
+        with metrics.span("semantic_cache"):
+            fingerprint = self._current_fingerprint()
+            cached = self.semantic_cache.lookup(query_vector, k, fingerprint)
+        return (query_vector, fingerprint), cached
+    
+    def _store_semantic_cache(self, cache_key, k: int, routing: Dict, answer: str):
+        """Store a freshly generated answer under the key from _check_semantic_cache"""
+        if cache_key is None or not answer:
+            return
+        vector, fingerprint = cache_key
+        self.semantic_cache.store(vector, k, routing, answer, fingerprint)
+    
+    def warm_up(self):
+        """
+        Run one embedding and one vector search so the first real query does
+        not pay for paging in model weights and loading the Chroma index
+        """
+        query_vector = self._embed_query("warm up")
+        if self.db._collection.count():
+            self.db._collection.query(query_embeddings=[query_vector], n_results=1, include=[])
+    
+    def _embed_query(self, query: str) -> List[float]:
+        """Embed a query with the same model the collection was built with"""
+        with metrics.span("embed"):
+            return self.db.embeddings.embed_query(query)
+    
+    def _current_fingerprint(self):
+        """
+        The collection fingerprint, re-read at most every collection_check_interval seconds
+        
+        Saves a Chroma count and a stat per request; changes made by an
+        ingestion run are picked up within the interval. A snapshot never
+        changes, so it is read once.
+        """
+        now = time.monotonic()
+        if self._fingerprint is None or (
+            not self.snapshot and now - self._fingerprint_checked >= self.collection_check_interval
+        ):
+            self._fingerprint = self._collection_fingerprint()
+            self._fingerprint_checked = now
+        return self._fingerprint
+    
+    def _collection_fingerprint(self):
+        """Cheap marker that changes when the Chroma collection is modified"""
+        if self.snapshot:
+            # A snapshot never changes, and the live state file describes another directory
+            return (self.db._collection.count(), None)
+        # Chunk count misses in-place upserts, so include the ingestion state mtime
+        state_path = os.path.join(PERSIST_DIRECTORY, INGEST_STATE_FILE)
+        state_mtime = os.path.getmtime(state_path) if os.path.exists(state_path) else None
+        return (self.db._collection.count(), state_mtime)
+    
+    def _print_routing(self, routing: Dict):
+        """Print routing information for verbose runs"""
+        print(f"\n🔀 Routing Result:")
+        print(f"   Type: {routing['query_type']}")
+        print(f"   Sections: {routing['sections']}")
+        print(f"   Albums: {routing['albums']}")
+        print(f"   Confidence: {routing.get('confidence', 0):.2f}")
+        print(f"   Method: {routing.get('method', 'unknown')}\n")
+    
+    def _print_timings(self, timings: Dict):
+        """Print per-stage timings for verbose runs"""
+        print(f"\n⏱️  Timings ({timings['total_ms']:.0f} ms total):")
+        for stage, entry in timings["stages"].items():
+            calls = f" x{entry['count']}" if entry["count"] > 1 else ""
+            print(f"   {stage}: {entry['ms']:.1f} ms{calls}")
+        for name in ("prompt_tokens", "completion_tokens", "context_docs", "context_chars"):
+            if name in timings:
+                print(f"   {name}: {timings[name]:.0f}")
     
-    def _retrieve_for_comparison(self, query: str, routing: Dict, k: int) -> Dict[str, List]:
+    def _retrieve_for_comparison(self, query: str, query_vector: List[float], routing: Dict,
+                                 k: int) -> Dict[str, List]:
         """
         Retrieve documents for comparison queries
         Returns dict with keys like "The Link_technical_analysis"
         """
-        results = {}
+        if self.comparison_retrieval == "concurrent":
+            return self._retrieve_for_comparison_concurrent(query, query_vector, routing, k)
+        return self._retrieve_for_comparison_batched(query, query_vector, routing, k)
+    
+    def _retrieve_for_comparison_batched(self, query: str, query_vector: List[float], routing: Dict,
+                                         k: int) -> Dict[str, List]:
+        """
+        One widened Chroma query filtered with $in on album and section,
+        partitioned and capped at k per album/section key in Python
+        """
+        keys = [(album, section) for album in routing["albums"] for section in routing["sections"]]
+        results = {f"{album}_{section}": [] for album, section in keys}
+        search_filter = {"$and": [
+            {"album": {"$in": routing["albums"]}},
+            {"section": {"$in": routing["sections"]}}
+        ]}
         
-        for album in routing["albums"]:
-            for section in routing["sections"]:
-                key = f"{album}_{section}"
-                
-                docs = self.db.similarity_search(
-                    query,
-                    k=k,
-                    filter={"$and": [
-                        {"album": album},
-                        {"section": section}
-                    ]}
-                )
-                
-                results[key] = docs
+        if self.retrieval_mode == "mmr":
+            docs, vectors = self._fetch_candidates(
+                query_vector, k * len(keys) * self.mmr_fetch_multiplier, search_filter
+            )
+            rows_by_key = defaultdict(list)
+            for row, doc in enumerate(docs):
+                rows_by_key[f"{doc.metadata.get('album')}_{doc.metadata.get('section')}"].append(row)
+            for key, rows in rows_by_key.items():
+                if key in results:
+                    results[key] = self._select_mmr(query_vector, [docs[row] for row in rows],
+                                                    vectors[rows], k)
+        else:
+            docs = self._search(query, query_vector, k * len(keys), search_filter)
+            
+            # Docs arrive in ranked order, so the first k per key are its top k
+            for doc in docs:
+                key = f"{doc.metadata.get('album')}_{doc.metadata.get('section')}"
+                if key in results and len(results[key]) < k:
+                    results[key].append(doc)
+        
+        # Keys crowded out of the widened result get a targeted search
+        for album, section in keys:
+            key = f"{album}_{section}"
+            if not results[key]:
+                results[key] = self._search_album_section(query, query_vector, album, section, k)
         
         return results
     
-    def _retrieve_single_or_multi(self, query: str, routing: Dict, k: int) -> List:
+    def _retrieve_for_comparison_concurrent(self, query: str, query_vector: List[float], routing: Dict,
+                                            k: int) -> Dict[str, List]:
+        """One filtered Chroma query per album/section key, issued concurrently"""
+        keys = [(album, section) for album in routing["albums"] for section in routing["sections"]]
+        futures = {
+            f"{album}_{section}": self._key_executor.submit(
+                contextvars.copy_context().run,
+                self._search_album_section, query, query_vector, album, section, k
+            )
+            for album, section in keys
+        }
+        return {key: future.result() for key, future in futures.items()}
+    
+    def _search_album_section(self, query: str, query_vector: List[float], album: str, section: str,
+                              k: int) -> List:
+        """Search restricted to one album/section pair"""
+        return self._search(query, query_vector, k, {"$and": [
+            {"album": album},
+            {"section": section}
+        ]})
+    
+    def _retrieve_single_or_multi(self, query: str, query_vector: List[float], routing: Dict, k: int) -> List:
         """Retrieve documents for single or multi-section queries"""
         filters = []
         
@@ -100,32 +515,143 @@ class QueryHandler:
         else:
             search_filter = None
         
-        docs = self.db.similarity_search(
-            query,
-            k=k,
-            filter=search_filter
-        )
+        return self._search(query, query_vector, k, search_filter)
+    
+    def _search(self, query: str, query_vector: List[float], k: int, search_filter: Optional[Dict]) -> List:
+        """Up to k documents for a filter, using the configured retrieval mode"""
+        if self.retrieval_mode == "mmr":
+            docs, vectors = self._fetch_candidates(query_vector, k * self.mmr_fetch_multiplier, search_filter)
+            return self._select_mmr(query_vector, docs, vectors, k)
+        if self.retrieval_mode == "hybrid":
+            return self._search_hybrid(query, query_vector, k, search_filter)
         
-        return docs
+        with metrics.span("similarity_search"):
+            return self.db.similarity_search_by_vector(
+                query_vector,
+                k=k,
+                filter=search_filter
+            )
+    
+    def _search_hybrid(self, query: str, query_vector: List[float], k: int,
+                       search_filter: Optional[Dict]) -> List:
+        """
+        Vector and BM25 rankings over the same chunks, fused with reciprocal rank fusion
+        
+        Exact names (track titles, people) that embeddings blur still rank via
+        BM25, so a smaller k keeps its recall.
+        """
+        n = k * self.hybrid_fetch_multiplier
+        vector_docs, _ = self._fetch_candidates(query_vector, n, search_filter, embeddings=False)
+        with metrics.span("lexical_search"):
+            lexical_hits = self.lexical_index.search(query, n, search_filter)
+        
+        lexical_ids = [self.lexical_index.ids[row] for row, _ in lexical_hits]
+        fused = reciprocal_rank_fusion([[doc.id for doc in vector_docs], lexical_ids], k=self.rrf_k)[:k]
+        
+        # The index holds no texts - fetch the lexical-only hits that made the cut
+        docs_by_id = {doc.id: doc for doc in vector_docs}
+        missing = [doc_id for doc_id in fused if doc_id not in docs_by_id]
+        if missing:
+            result = self.db.get(ids=missing, include=["documents", "metadatas"])
+            for doc_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"]):
+                docs_by_id[doc_id] = Document(page_content=text, metadata=metadata or {}, id=doc_id)
+        # A chunk deleted since the index was built is simply dropped
+        return [docs_by_id[doc_id] for doc_id in fused if doc_id in docs_by_id]
+    
+    def _fetch_candidates(self, query_vector: List[float], n: int, search_filter: Optional[Dict],
+                          embeddings: bool = True):
+        """Top n documents by similarity, with their stored embeddings unless embeddings=False"""
+        include = ["documents", "metadatas"] + (["embeddings"] if embeddings else [])
+        with metrics.span("similarity_search"):
+            result = self.db._collection.query(
+                query_embeddings=[query_vector],
+                n_results=n,
+                where=search_filter,
+                include=include
+            )
+        docs = [
+            Document(page_content=text, metadata=metadata or {}, id=doc_id)
+            for doc_id, text, metadata in zip(result["ids"][0], result["documents"][0], result["metadatas"][0])
+        ]
+        if not embeddings:
+            return docs, None
+        return docs, np.asarray(result["embeddings"][0], dtype=np.float32)
+    
+    def _select_mmr(self, query_vector: List[float], docs: List, vectors: np.ndarray, k: int) -> List:
+        """Diverse, relevance-cut subset of the candidates (at most k)"""
+        with metrics.span("mmr"):
+            selected = mmr_select(
+                query_vector, vectors, k,
+                lambda_mult=self.mmr_lambda,
+                min_relevance=self.min_relevance,
+                relevance_window=self.relevance_window
+            )
+        return [docs[i] for i in selected]
     
     def _generate_comparison_response(self, query: str, context: Dict[str, List], routing: Dict) -> str:
         """Generate response for comparison queries"""
+        with metrics.span("prompt_build"):
+            prompt = self._build_comparison_prompt(query, context, routing)
+        return self._generate(prompt)
+    
+    def _generate_single_response(self, query: str, context: List, routing: Dict) -> str:
+        """Generate response for single queries"""
+        with metrics.span("prompt_build"):
+            prompt = self._build_single_prompt(query, context, routing)
+        return self._generate(prompt)
+    
+    def _generate(self, prompt: str) -> str:
+        """One admitted, timed LLM call - records Ollama's token counts"""
+        with self.llm_gate.slot():
+            with metrics.span("generate"):
+                generation = self.llm.generate([prompt]).generations[0][0]
+        metrics.record_generation_info(generation.generation_info)
+        return generation.text
+    
+    async def _agenerate(self, prompt: str) -> str:
+        """Async version of _generate"""
+        async with self.llm_gate.aslot():
+            with metrics.span("generate"):
+                result = await self.llm.agenerate([prompt])
+        generation = result.generations[0][0]
+        metrics.record_generation_info(generation.generation_info)
+        return generation.text
+    
+    def _count_context(self, context_str: str, docs: List):
+        """Record context size, and how much the context builder trimmed"""
+        metrics.count("context_docs", len(docs))
+        metrics.count("context_chars", len(context_str))
+        metrics.count("context_chars_trimmed",
+                      max(0, sum(len(doc.page_content) for doc in docs) - len(context_str)))
+    
+    def _build_comparison_prompt(self, query: str, context: Dict[str, List], routing: Dict) -> str:
+        """Build the LLM prompt for comparison queries"""
         # Build context string with clear separation
         context_str = ""
         
+        group_budget = None
+        if self.context_builder is not None:
+            group_budget = self.context_builder.group_budget(sum(1 for docs in context.values() if docs))
+        
         # Group by album
         for album in routing["albums"]:
             album_context_parts = []
             for section in routing["sections"]:
                 key = f"{album}_{section}"
                 if key in context and context[key]:
-                    section_content = "\n\n".join(doc.page_content for doc in context[key])
+                    if self.context_builder is not None:
+                        passages = self.context_builder.assemble(context[key], group_budget)
+                    else:
+                        passages = [doc.page_content for doc in context[key]]
+                    section_content = "\n\n".join(passages)
                     album_context_parts.append(f"[{section.upper()}]\n{section_content}")
             
             if album_context_parts:
                 context_str += f"\n\n=== {album.upper()} ===\n"
                 context_str += "\n\n".join(album_context_parts)
         
+        self._count_context(context_str, [doc for docs in context.values() for doc in docs])
+        
         sections_str = ", ".join(routing["sections"])
         albums_str = " and ".join(routing["albums"])
         
@@ -147,12 +673,15 @@ ANSWER:
 Provide a confident, detailed comparison using the information from both albums. Present your analysis as clear, factual observations.
 """
 
-        response = self.llm.invoke(prompt)
-        return response
+        return prompt
     
-    def _generate_single_response(self, query: str, context: List, routing: Dict) -> str:
-        """Generate response for single queries"""
-        context_str = "\n\n".join(doc.page_content for doc in context)
+    def _build_single_prompt(self, query: str, context: List, routing: Dict) -> str:
+        """Build the LLM prompt for single queries"""
+        if self.context_builder is not None:
+            context_str = self.context_builder.build(context)
+        else:
+            context_str = "\n\n".join(doc.page_content for doc in context)
+        self._count_context(context_str, context)
         
         sections_str = ", ".join(routing["sections"])
         
@@ -178,6 +707,5 @@ ANSWER:
 Provide a clear, confident answer directly addressing the question. State facts from the context as certainties.
 """
 
-        response = self.llm.invoke(prompt)
-        return response
+        return prompt
 
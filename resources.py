@@ -0,0 +1,208 @@
+"""
+Resource Registry
+Process-wide singletons for the embedding model, Chroma stores and Ollama clients
+
+Every component (router, query handler, ingestion, benchmarks) asks the
+registry instead of constructing its own, so one process holds one copy of
+the embedding weights and one HTTP connection pool per Ollama model.
+"""
+import atexit
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from langchain_ollama import OllamaLLM
+from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_chroma import Chroma
+from admission import AdmissionController
+from embedding_cache import CachedEmbeddings, EmbeddingStore
+
+try:
+    import fcntl
+except ImportError:  # Windows - no cross-process locking
+    fcntl = None
+
+# Chroma persist directory and the ingestion state file kept inside it
+PERSIST_DIRECTORY = "gojiraDB"
+INGEST_STATE_FILE = "ingest_state.json"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# Held by ingestion around every Chroma write and by snapshots while copying
+VECTORSTORE_LOCK_FILE = ".write.lock"
+
+# One lock for construction only - lookups of already-built resources take it briefly
+_lock = threading.RLock()
+_embeddings = None
+_vectorstores: Dict[Tuple[str, bool], Chroma] = {}
+_llms: Dict[Tuple[str, str], OllamaLLM] = {}
+_llm_gate = None
+# Snapshot directory per persist directory - survives reset(), so forked workers share it
+_snapshots: Dict[str, str] = {}
+
+
+def create_embeddings():
+    """Embedding model, fronted by the persistent embedding cache unless disabled"""
+    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+
+    # Set EMBEDDING_CACHE_DIR="" to disable the cache
+    cache_dir = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+    if cache_dir:
+        store = EmbeddingStore(
+            os.path.join(cache_dir, EMBEDDING_MODEL),
+            readonly=os.getenv("EMBEDDING_CACHE_READONLY", "false").lower() == "true"
+        )
+        embeddings = CachedEmbeddings(
+            embeddings, store, namespace=EMBEDDING_MODEL,
+            query_cache_size=int(os.getenv("EMBEDDING_QUERY_CACHE_SIZE", "1024"))
+        )
+
+    return embeddings
+
+
+def get_embeddings():
+    """The shared embedding model (loaded on first use)"""
+    global _embeddings
+    with _lock:
+        if _embeddings is None:
+            _embeddings = create_embeddings()
+        return _embeddings
+
+
+def snapshot_mode() -> bool:
+    """Whether serving reads from a snapshot (VECTORSTORE_MODE=snapshot)"""
+    return os.getenv("VECTORSTORE_MODE", "shared").lower() == "snapshot"
+
+
+def get_vectorstore(persist_directory: str = PERSIST_DIRECTORY, snapshot: bool = False) -> Chroma:
+    """
+    The shared Chroma store for a persist directory
+
+    Args:
+        persist_directory: Live Chroma directory
+        snapshot: Open a consistent copy of the directory instead (see
+            snapshot_vectorstore), so serving never contends on the SQLite
+            file ingestion writes to. The copy is fixed until restart and
+            deleted at exit - read-only callers only, never writers.
+    """
+    key = (os.path.abspath(persist_directory), snapshot)
+    with _lock:
+        if key not in _vectorstores:
+            directory = snapshot_vectorstore(persist_directory) if snapshot else persist_directory
+            _vectorstores[key] = Chroma(
+                persist_directory=directory,
+                embedding_function=get_embeddings()
+            )
+        return _vectorstores[key]
+
+
+def get_llm(model: str = "mistral", base_url: Optional[str] = None) -> OllamaLLM:
+    """
+    The shared Ollama client for a model
+
+    A single OllamaLLM per (model, base_url) means one httpx connection pool,
+    so router and answer calls reuse keep-alive connections to Ollama.
+    """
+    # Support environment variable for Ollama URL (useful for Docker)
+    base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    key = (model, base_url)
+    with _lock:
+        if key not in _llms:
+            # How long Ollama keeps the model in memory between requests (e.g. "30m", "-1")
+            keep_alive = os.getenv("OLLAMA_KEEP_ALIVE") or None
+            if keep_alive and keep_alive.lstrip("-").isdigit():
+                keep_alive = int(keep_alive)
+            _llms[key] = OllamaLLM(model=model, base_url=base_url, keep_alive=keep_alive)
+        return _llms[key]
+
+
+def get_llm_gate() -> AdmissionController:
+    """The admission controller every Ollama call in this process goes through"""
+    global _llm_gate
+    with _lock:
+        if _llm_gate is None:
+            _llm_gate = AdmissionController(
+                max_concurrent=int(os.getenv("LLM_MAX_CONCURRENCY", "2")),
+                max_queue=int(os.getenv("LLM_QUEUE_DEPTH", "32")),
+                timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "60"))
+            )
+        return _llm_gate
+
+
+def preload():
+    """
+    Load model weights (and take the vector store snapshot) before forking workers
+
+    Chroma and Ollama clients hold SQLite handles and sockets that must not
+    cross a fork, so each worker opens its own on first use - in snapshot
+    mode, all of them on the one copy taken here.
+    """
+    get_embeddings()
+    if snapshot_mode():
+        snapshot_vectorstore()
+
+
+@contextmanager
+def vectorstore_lock(persist_directory: str = PERSIST_DIRECTORY):
+    """Exclusive cross-process lock on a persist directory's writes"""
+    if fcntl is None or not os.path.isdir(persist_directory):
+        yield
+        return
+    with open(os.path.join(persist_directory, VECTORSTORE_LOCK_FILE), "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def snapshot_vectorstore(persist_directory: str = PERSIST_DIRECTORY) -> str:
+    """
+    Consistent read-only copy of a persist directory, taken once per process tree
+
+    The copy is made under vectorstore_lock, so no ingestion write is half
+    done, and the SQLite database goes through the backup API rather than a
+    file copy. Removed at exit by the process that took it.
+    """
+    key = os.path.abspath(persist_directory)
+    with _lock:
+        if key not in _snapshots:
+            _snapshots[key] = _snapshot_directory(persist_directory)
+        return _snapshots[key]
+
+
+def reset(keep_embeddings: bool = False):
+    """Drop cached resources (keep_embeddings=True after a fork: weights are shared copy-on-write)"""
+    global _embeddings, _llm_gate
+    with _lock:
+        if not keep_embeddings:
+            _embeddings = None
+        _vectorstores.clear()
+        _llms.clear()
+        _llm_gate = None
+
+
+def _snapshot_directory(persist_directory: str) -> str:
+    snapshot = tempfile.mkdtemp(prefix=f"{os.path.basename(os.path.abspath(persist_directory))}-snapshot-")
+    database = "chroma.sqlite3"
+    with vectorstore_lock(persist_directory):
+        # HNSW segment files first - Chroma replays anything they lack from SQLite
+        shutil.copytree(
+            persist_directory, snapshot, dirs_exist_ok=True,
+            ignore=shutil.ignore_patterns(f"{database}*", VECTORSTORE_LOCK_FILE)
+        )
+        source_path = os.path.join(persist_directory, database)
+        if os.path.exists(source_path):
+            source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+            target = sqlite3.connect(os.path.join(snapshot, database))
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+
+    # Forked workers inherit atexit handlers; only the owner removes the copy
+    owner = os.getpid()
+    atexit.register(lambda: os.getpid() == owner and shutil.rmtree(snapshot, ignore_errors=True))
+    return snapshot
@@ -0,0 +1,118 @@
+"""
+Routing Batcher
+Coalesces concurrent LLM routing requests into one multi-query prompt
+
+Requests arriving within a short window are classified by a single Ollama
+call; results are fanned back out to the waiting callers. Queries the batch
+response does not cover are retried one by one - unless the batch was refused
+admission, in which case every caller gets the rejection (and falls back to
+keyword routing) rather than N more attempts at the saturated LLM queue.
+"""
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Set
+from admission import AdmissionRejected
+
+
+class RoutingBatcher:
+    """Micro-batching scheduler for QueryRouter's async LLM tier"""
+
+    def __init__(self, router, window_ms: float = 10.0, max_batch: int = 8):
+        """
+        Args:
+            router: QueryRouter that builds the prompts and parses responses
+            window_ms: How long the first request of a batch waits for company
+            max_batch: Flush as soon as this many distinct queries are pending
+        """
+        self.router = router
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        # Pending queries per event loop: query -> futures of every caller asking it
+        self._pending: Dict[asyncio.AbstractEventLoop, OrderedDict] = {}
+        self._timers: Dict[asyncio.AbstractEventLoop, asyncio.TimerHandle] = {}
+        # Strong references - the event loop only keeps weak ones to running tasks
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.batched_queries = 0
+        self.fallbacks = 0
+        self.rejected = 0
+
+    async def classify(self, query: str) -> Dict:
+        """Routing result for one query, possibly answered as part of a batch"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        pending = self._pending.setdefault(loop, OrderedDict())
+        pending.setdefault(query, []).append(future)
+
+        if len(pending) >= self.max_batch:
+            self._flush(loop)
+        elif loop not in self._timers:
+            self._timers[loop] = loop.call_later(self.window, self._flush, loop)
+
+        return await future
+
+    def stats(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "batched_queries": self.batched_queries,
+            "avg_batch_size": round(self.batched_queries / self.batches, 2) if self.batches else 0.0,
+            "fallbacks": self.fallbacks,
+            "rejected": self.rejected
+        }
+
+    def _flush(self, loop: asyncio.AbstractEventLoop):
+        timer = self._timers.pop(loop, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(loop, None)
+        if pending:
+            task = loop.create_task(self._run_batch(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, pending: OrderedDict):
+        queries = list(pending)
+        self.batches += 1
+        self.batched_queries += len(queries)
+
+        results = {}
+        if len(queries) > 1:
+            try:
+                async with self.router.llm_gate.aslot(timeout=self.router.queue_timeout):
+                    raw_response = await self.router.llm.ainvoke(
+                        self.router._build_batch_routing_prompt(queries)
+                    )
+                results = self.router._parse_batch_routing_response(raw_response, len(queries))
+            except AdmissionRejected as e:
+                # The queue is saturated - retrying one by one would only add load
+                self.rejected += 1
+                self._resolve(pending, {i: e for i in range(len(queries))})
+                return
+            except Exception as e:
+                print(f"⚠️  Batched routing failed: {e}, routing queries individually")
+
+        # Anything the batch did not answer goes through the single-query path
+        missing = [i for i in range(len(queries)) if i not in results]
+        if missing:
+            self.fallbacks += len(missing) if len(queries) > 1 else 0
+            singles = await asyncio.gather(
+                *(self.router._arequest_routing(queries[i]) for i in missing),
+                return_exceptions=True
+            )
+            results.update(zip(missing, singles))
+
+        self._resolve(pending, results)
+
+    @staticmethod
+    def _resolve(pending: OrderedDict, results: Dict):
+        """Hand each query's result (or exception) to every caller waiting on it"""
+        for i, query in enumerate(pending):
+            result = results[i]
+            for future in pending[query]:
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(dict(result))
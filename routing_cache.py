@@ -0,0 +1,114 @@
+"""
+Routing Cache
+Memoizes LLM routing decisions by normalized query text, prompt version and model
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class RoutingCache:
+    """In-memory LRU front with an optional SQLite tier that survives restarts"""
+
+    def __init__(self, max_entries: int = 1024, db_path: Optional[str] = None):
+        """
+        Args:
+            max_entries: Capacity of the in-memory LRU
+            db_path: SQLite file for the persistent tier (None = memory only)
+        """
+        self.max_entries = max_entries
+        self.db_path = db_path
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._conn = None
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            # WAL lets several server processes read while one writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS routing_cache ("
+                "key TEXT PRIMARY KEY, routing TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Lowercase, collapse whitespace and drop trailing punctuation"""
+        normalized = re.sub(r"\s+", " ", query.lower()).strip()
+        return normalized.rstrip("?!. ")
+
+    @classmethod
+    def make_key(cls, query: str, prompt_version: str, model: str) -> str:
+        """Cache key - changes whenever the prompt or the model changes"""
+        raw = f"{model}\x1f{prompt_version}\x1f{cls.normalize_query(query)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a copy of the cached routing, or None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return dict(self._memory[key])
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT routing FROM routing_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    routing = json.loads(row[0])
+                    self._remember(key, routing)
+                    self.disk_hits += 1
+                    return dict(routing)
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, routing: Dict):
+        """Cache a routing decision in memory and, if configured, on disk"""
+        routing = dict(routing)
+        with self._lock:
+            self._remember(key, routing)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO routing_cache (key, routing, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(routing), time.time())
+                )
+                self._conn.commit()
+
+    def clear(self):
+        """Drop every cached decision from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM routing_cache")
+                self._conn.commit()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters per tier"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0
+            }
+
+    def _remember(self, key: str, routing: Dict):
+        self._memory[key] = routing
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
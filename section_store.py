@@ -0,0 +1,80 @@
+"""
+Section Store
+In-memory (album, section) -> full section text, built from the Chroma collection
+
+Enumeration sections (e.g. the tracklist) and sections small enough to fit
+in a prompt whole are served by direct lookup instead of vector search.
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from context_builder import ContextBuilder
+
+
+class SectionStore:
+    """Ordered full text of every album/section, for whole-section answers"""
+
+    def __init__(self, sections: Dict[Tuple[str, str], Dict], max_chars: int = 1500):
+        """
+        Args:
+            sections: (album, section) -> {"text": str, "type": str, "chunks": int}
+            max_chars: Largest non-enumeration section served whole
+        """
+        self.sections = sections
+        self.max_chars = max_chars
+
+    @classmethod
+    def from_vectorstore(cls, db, max_chars: int = 1500) -> "SectionStore":
+        """Reassemble each section from its stored chunks (deduped, overlap merged, in order)"""
+        data = db.get(include=["documents", "metadatas"])
+        grouped = defaultdict(list)
+        for doc_id, text, metadata in zip(data["ids"], data["documents"], data["metadatas"]):
+            metadata = metadata or {}
+            if metadata.get("album") and metadata.get("section"):
+                grouped[(metadata["album"], metadata["section"])].append(
+                    Document(page_content=text, metadata=metadata, id=doc_id)
+                )
+
+        # No budget - the whole section is kept
+        builder = ContextBuilder(section_tokens=10 ** 9, max_tokens=10 ** 9)
+        sections = {}
+        for key, docs in grouped.items():
+            sections[key] = {
+                "text": "\n\n".join(builder.assemble(docs)),
+                "type": "enumeration" if any(doc.metadata.get("type") == "enumeration" for doc in docs) else "prose",
+                "chunks": len(docs)
+            }
+        return cls(sections, max_chars=max_chars)
+
+    def serves(self, album: str, section: str) -> bool:
+        """True when the section is an enumeration or small enough to send whole"""
+        entry = self.sections.get((album, section))
+        if entry is None:
+            return False
+        return entry["type"] == "enumeration" or len(entry["text"]) <= self.max_chars
+
+    def document(self, album: str, section: str) -> Optional[Document]:
+        entry = self.sections.get((album, section))
+        if entry is None:
+            return None
+        return Document(
+            page_content=entry["text"],
+            metadata={"album": album, "section": section, "type": entry["type"], "source": "section_store"}
+        )
+
+    def context_for(self, routing: Dict) -> Optional[Dict[str, List]]:
+        """
+        Whole-section documents for every album/section the routing selected
+
+        Returns:
+            {"<album>_<section>": [Document]}, or None unless every pair is served
+        """
+        albums, sections = routing.get("albums") or [], routing.get("sections") or []
+        if not albums or not sections:
+            return None
+        if not all(self.serves(album, section) for album in albums for section in sections):
+            return None
+        return {
+            f"{album}_{section}": [self.document(album, section)]
+            for album in albums for section in sections
+        }
@@ -0,0 +1,149 @@
+"""
+Semantic Answer Cache
+Serves routing + answers for near-duplicate queries using embedding similarity
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+
+
+class SemanticCache:
+    """LRU/TTL cache of answers keyed on normalized query embeddings"""
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 256,
+                 ttl_seconds: float = 3600):
+        """
+        Args:
+            threshold: Minimum cosine similarity for a cache hit
+            max_entries: LRU capacity
+            ttl_seconds: Entries older than this are treated as misses and dropped
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None  # (max_entries, dim), row per slot
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()  # slot -> entry, LRU order
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._fingerprint = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, vector: List[float], k: int, fingerprint=None) -> Optional[Dict]:
+        """
+        Find a cached answer for a similar query
+
+        Args:
+            vector: Query embedding
+            k: Retrieval depth of the request - only entries with the same k match
+            fingerprint: Current collection fingerprint; a change clears the cache
+
+        Returns:
+            {"answer": str, "routing": Dict, "similarity": float} or None
+        """
+        query_vec = self._normalize(vector)
+
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            self._expire()
+
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            slots = np.fromiter(self._entries.keys(), dtype=np.int64)
+            entry_ks = np.fromiter((e["k"] for e in self._entries.values()), dtype=np.int64)
+
+            # Best match among entries with the same k
+            similarities = np.where(entry_ks == k, self._matrix[slots] @ query_vec, -1.0)
+            best = int(np.argmax(similarities))
+            best_slot, best_sim = int(slots[best]), float(similarities[best])
+
+            if best_sim < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_slot)
+            entry = self._entries[best_slot]
+            self.hits += 1
+            return {
+                "answer": entry["answer"],
+                "routing": dict(entry["routing"]),
+                "similarity": best_sim
+            }
+
+    def store(self, vector: List[float], k: int, routing: Dict, answer: str,
+              fingerprint=None):
+        """Cache an answer and the routing that produced it"""
+        query_vec = self._normalize(vector)
+
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, query_vec.shape[0]), dtype=np.float32)
+
+            if not self._free_slots:
+                # Evict least recently used
+                slot, _ = self._entries.popitem(last=False)
+                self._free_slots.append(slot)
+                self.evictions += 1
+
+            slot = self._free_slots.pop()
+            self._matrix[slot] = query_vec
+            self._entries[slot] = {
+                "k": k,
+                "routing": dict(routing),
+                "answer": answer,
+                "created": time.monotonic()
+            }
+
+    def invalidate(self):
+        """Drop every cached entry (e.g. after re-ingestion)"""
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def _check_fingerprint(self, fingerprint):
+        """Clear the cache when the underlying collection has changed"""
+        if fingerprint is None:
+            return
+        if self._fingerprint is not None and fingerprint != self._fingerprint:
+            self._clear()
+        self._fingerprint = fingerprint
+
+    def _expire(self):
+        """Drop entries older than the TTL"""
+        if self.ttl_seconds is None or self.ttl_seconds <= 0:
+            return
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [slot for slot, entry in self._entries.items() if entry["created"] < cutoff]
+        for slot in expired:
+            del self._entries[slot]
+            self._free_slots.append(slot)
+
+    def _clear(self):
+        self._entries.clear()
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
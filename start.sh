@@ -42,6 +42,13 @@ ollama pull mistral || {
 }
 
 # Start the API server (this will be the main process)
+# WEB_CONCURRENCY > 1 runs gunicorn with preloaded models and one uvicorn worker per process
+WEB_CONCURRENCY=${WEB_CONCURRENCY:-1}
+if [ "$WEB_CONCURRENCY" -gt 1 ]; then
+  echo "Starting FastAPI server with $WEB_CONCURRENCY workers..."
+  exec gunicorn -c gunicorn.conf.py api:app
+fi
+
 echo "Starting FastAPI server..."
 exec uvicorn api:app --host 0.0.0.0 --port 8000
 
@@ -0,0 +1,189 @@
+"""
+Stub Ollama Server
+Speaks enough of the Ollama HTTP API (/api/generate, /api/tags) for
+benchmarks and offline runs - no model, configurable latency
+
+Routing prompts get canned JSON routing output; answer prompts get a fixed
+number of filler tokens.
+Usage: python stub_ollama.py [--port 11435] [--prompt-latency 0.2] [--token-latency 0.01]
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+DEFAULT_ROUTING = {
+    "query_type": "single",
+    "sections": ["overview"],
+    "albums": ["The Link"],
+    "confidence": 0.9
+}
+
+
+class StubConfig:
+    """Latency and output settings shared by all request threads"""
+
+    def __init__(self, prompt_latency: float = 0.2, token_latency: float = 0.01,
+                 tokens: int = 64, routing: Dict = None, model: str = "mistral"):
+        """
+        Args:
+            prompt_latency: Seconds before the first token (prompt evaluation)
+            token_latency: Seconds per generated token
+            tokens: Tokens per answer
+            routing: Routing result returned for classification prompts
+            model: Model name reported by /api/tags
+        """
+        self.prompt_latency = prompt_latency
+        self.token_latency = token_latency
+        self.tokens = tokens
+        self.routing = routing or DEFAULT_ROUTING
+        self.model = model
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: StubConfig = None
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": f"{self.config.model}:latest", "model": f"{self.config.model}:latest"}]})
+        elif self.path == "/":
+            self._send_text("Ollama is running")
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json({"error": "not found"}, status=404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.config.count_request()
+
+        prompt = body.get("prompt", "")
+        tokens = self._response_tokens(prompt)
+        prompt_tokens = len(prompt.split())
+        time.sleep(self.config.prompt_latency)
+
+        if body.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                time.sleep(self.config.token_latency)
+                self._write_chunk(self._part(body, token, done=False))
+            self._write_chunk(self._part(body, "", done=True, prompt_tokens=prompt_tokens,
+                                         eval_tokens=len(tokens)))
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            time.sleep(self.config.token_latency * len(tokens))
+            self._send_json(self._part(body, "".join(tokens), done=True,
+                                       prompt_tokens=prompt_tokens, eval_tokens=len(tokens)))
+
+    def log_message(self, format, *args):
+        pass
+
+    def _response_tokens(self, prompt: str):
+        """Canned routing JSON for classification prompts, filler text otherwise"""
+        if "Output ONLY a valid JSON array" in prompt:
+            match = re.search(r"each of these (\d+) queries", prompt)
+            count = int(match.group(1)) if match else 1
+            text = json.dumps([{"id": i + 1, **self.config.routing} for i in range(count)])
+            return [text]
+        if "Output ONLY valid JSON" in prompt:
+            return [json.dumps(self.config.routing)]
+        return [f"token{i} " for i in range(self.config.tokens)]
+
+    def _part(self, body: Dict, text: str, done: bool, prompt_tokens: int = 0,
+              eval_tokens: int = 0) -> Dict:
+        part = {
+            "model": body.get("model", self.config.model),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "response": text,
+            "done": done
+        }
+        if done:
+            part.update({
+                "done_reason": "stop",
+                "prompt_eval_count": prompt_tokens,
+                "eval_count": eval_tokens
+            })
+        return part
+
+    def _write_chunk(self, part: Dict):
+        data = (json.dumps(part) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, payload: Dict, status: int = 200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_text(self, text: str):
+        data = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_stub_server(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """HTTP server bound to host:port (port 0 picks a free one)"""
+    handler = type("ConfiguredStubOllamaHandler", (StubOllamaHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_stub_server(config: StubConfig, host: str = "127.0.0.1", port: int = 0):
+    """Serve the stub on a background thread; returns (server, base_url)"""
+    server = make_stub_server(config, host, port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Ollama server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--prompt-latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Seconds per token")
+    parser.add_argument("--tokens", type=int, default=64, help="Tokens per answer")
+    parser.add_argument("--routing", help="JSON routing result returned for classification prompts")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        prompt_latency=args.prompt_latency,
+        token_latency=args.token_latency,
+        tokens=args.tokens,
+        routing=json.loads(args.routing) if args.routing else None
+    )
+    server = make_stub_server(config, args.host, args.port)
+    base_url = f"http://{args.host}:{server.server_address[1]}"
+    print(f"🧪 Stub Ollama listening on {base_url} (set OLLAMA_BASE_URL={base_url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
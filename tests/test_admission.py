@@ -0,0 +1,187 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, QueueFullError, QueueTimeoutError
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    async def scenario():
+        gate = AdmissionController(max_concurrent=1, max_queue=8, timeout=5)
+        order = []
+
+        async def caller(name):
+            async with gate.aslot():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await gate.aacquire()
+        tasks = []
+        for name in range(5):
+            tasks.append(asyncio.create_task(caller(name)))
+            await asyncio.sleep(0)
+        assert gate.stats()["queued"] == 5
+        gate.release()
+        await asyncio.gather(*tasks)
+        return order, gate.stats()
+
+    order, stats = run(scenario())
+    assert order == [0, 1, 2, 3, 4]
+    assert stats["active"] == 0 and stats["queued"] == 0 and stats["admitted"] == 6
+
+
+def test_release_hands_the_slot_to_a_thread_waiter():
+    gate = AdmissionController(max_concurrent=1, max_queue=1, timeout=5)
+    gate.acquire()
+    admitted = threading.Event()
+
+    def waiter():
+        with gate.slot():
+            admitted.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    while gate.stats()["queued"] == 0:
+        time.sleep(0.001)
+    assert not admitted.is_set()
+    gate.release()
+    thread.join(timeout=5)
+    assert admitted.is_set()
+    assert gate.stats()["active"] == 0
+
+
+def test_full_queue_is_rejected_with_429():
+    async def scenario():
+        gate = AdmissionController(max_concurrent=1, max_queue=1, timeout=5)
+        await gate.aacquire()
+        queued = asyncio.create_task(gate.aacquire())
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError) as excinfo:
+            await gate.aacquire()
+        gate.release()
+        await queued
+        gate.release()
+        return excinfo.value, gate.stats()
+
+    error, stats = run(scenario())
+    assert error.status_code == 429
+    assert stats["rejected_full"] == 1 and stats["active"] == 0
+
+
+def test_wait_timeout_is_rejected_with_503_and_leaves_the_queue():
+    async def scenario():
+        gate = AdmissionController(max_concurrent=1, max_queue=4, timeout=5)
+        await gate.aacquire()
+        with pytest.raises(QueueTimeoutError) as excinfo:
+            await gate.aacquire(timeout=0.01)
+        stats = gate.stats()
+        gate.release()
+        return excinfo.value, stats, gate.stats()
+
+    error, during, after = run(scenario())
+    assert error.status_code == 503
+    assert during["queued"] == 0 and during["rejected_timeout"] == 1
+    assert after["active"] == 0
+
+
+def test_sync_wait_timeout_is_rejected_with_503():
+    gate = AdmissionController(max_concurrent=1, max_queue=4, timeout=5)
+    gate.acquire()
+    with pytest.raises(QueueTimeoutError):
+        gate.acquire(timeout=0.01)
+    assert gate.stats()["queued"] == 0
+    gate.release()
+    assert gate.stats()["active"] == 0
+
+
+def test_grant_racing_the_timeout_keeps_the_slot():
+    # The slot is handed over after the wait timed out but before the waiter
+    # withdrew - the waiter must take it rather than time out and leak it
+    gate = AdmissionController(max_concurrent=1, max_queue=4, timeout=5)
+    gate.acquire()
+    waiter = gate._enqueue(None)
+    gate.release()
+    assert waiter.granted
+    gate._finish_wait(waiter, time.perf_counter())
+    assert gate.stats()["active"] == 1
+    gate.release()
+    assert gate.stats()["active"] == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        gate = AdmissionController(max_concurrent=1, max_queue=4, timeout=5)
+        await gate.aacquire()
+        task = asyncio.create_task(gate.aacquire())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        queued = gate.stats()["queued"]
+        gate.release()
+        return queued, gate.stats()
+
+    queued, stats = run(scenario())
+    assert queued == 0 and stats["active"] == 0
+
+
+def test_cancelled_after_grant_gives_the_slot_back():
+    async def scenario():
+        gate = AdmissionController(max_concurrent=1, max_queue=4, timeout=5)
+        await gate.aacquire()
+        task = asyncio.create_task(gate.aacquire())
+        await asyncio.sleep(0)
+        # Granted (the future resolves on a later loop turn), then cancelled
+        gate.release()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return gate.stats()
+
+    stats = run(scenario())
+    assert stats["active"] == 0 and stats["queued"] == 0
+
+
+def test_slot_is_released_when_the_call_raises():
+    gate = AdmissionController(max_concurrent=1, max_queue=0, timeout=5)
+    with pytest.raises(RuntimeError):
+        with gate.slot():
+            raise RuntimeError("ollama down")
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            async with gate.aslot():
+                raise RuntimeError("ollama down")
+
+    run(scenario())
+    assert gate.stats()["active"] == 0
+    # Both slots came back, so another caller is admitted without queueing
+    with gate.slot():
+        pass
+
+
+def test_check_capacity_rejects_only_when_a_new_caller_would_be():
+    async def scenario():
+        gate = AdmissionController(max_concurrent=1, max_queue=1, timeout=5)
+        gate.check_capacity()
+        await gate.aacquire()
+        gate.check_capacity()
+        queued = asyncio.create_task(gate.aacquire())
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError):
+            gate.check_capacity()
+        stats = gate.stats()
+        gate.release()
+        await queued
+        gate.release()
+        return stats
+
+    stats = run(scenario())
+    # The check takes no slot and joins no queue
+    assert stats["active"] == 1 and stats["queued"] == 1 and stats["rejected_full"] == 1
@@ -0,0 +1,123 @@
+import threading
+
+import numpy as np
+import pytest
+
+from centroid_router import CentroidClassifier
+from router import QueryRouter
+
+
+class FakeCollection:
+    def __init__(self, db):
+        self.db = db
+
+    def count(self):
+        return len(self.db.embeddings)
+
+
+class FakeVectorstore:
+    """Just enough of Chroma for from_vectorstore and the collection fingerprint"""
+
+    def __init__(self):
+        self.embeddings, self.metadatas = [], []
+        self._collection = FakeCollection(self)
+
+    def add(self, vector, section, album="The Link"):
+        self.embeddings.append(vector)
+        self.metadatas.append({"section": section, "album": album})
+
+    def get(self, include=None):
+        return {"ids": [str(i) for i in range(len(self.embeddings))],
+                "embeddings": self.embeddings, "metadatas": self.metadatas}
+
+
+def unit(*components):
+    vector = np.asarray(components, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def classifier(temperature=0.05):
+    return CentroidClassifier(
+        {"tracklist": unit(1, 0, 0), "recording_production": unit(0.9, 0.44, 0), "live_history": unit(0, 0, 1)},
+        {"The Link": unit(1, 0, 0), "From Mars to Sirius": unit(0, 0, 1)},
+        temperature=temperature
+    )
+
+
+def test_predicts_the_nearest_centroid_with_softmax_confidences():
+    ranked = classifier().score_sections(unit(1, 0.1, 0))
+    assert [label for label, _, _ in ranked] == ["tracklist", "recording_production", "live_history"]
+    assert sum(probability for _, probability, _ in ranked) == pytest.approx(1.0)
+
+    (_, top_prob, top_sim), (_, second_prob, second_sim), _ = ranked
+    assert top_sim == pytest.approx(float(unit(1, 0.1, 0) @ unit(1, 0, 0)))
+    # softmax: the probability ratio is exp(similarity gap / temperature)
+    assert top_prob / second_prob == pytest.approx(np.exp((top_sim - second_sim) / 0.05), rel=1e-4)
+    assert classifier().classify_albums(unit(1, 0.1, 0))[0][0] == "The Link"
+
+
+def test_lower_temperature_sharpens_confidence():
+    query = unit(1, 0.1, 0)
+    sharp = classifier(temperature=0.01).classify_sections(query)[0][1]
+    flat = classifier(temperature=0.5).classify_sections(query)[0][1]
+    assert sharp > 0.9 > flat
+
+
+def centroid_router(gap=0.05, threshold=0.3):
+    router = QueryRouter.__new__(QueryRouter)
+    router.mode = "embedding"
+    router.centroid_classifier = classifier()
+    router.confidence_threshold = threshold
+    router.multi_section_gap = gap
+    router._keyword_matcher = QueryRouter.build_keyword_matcher()
+    return router
+
+
+def test_close_runner_up_is_kept_by_similarity_gap():
+    # Between tracklist and recording_production: a similarity gap of ~0.04,
+    # although the softmax already gives the runner-up well under half the top probability
+    query = unit(1, 0.14, 0)
+    ranked = classifier().score_sections(query)
+    assert ranked[0][1] > 2 * ranked[1][1]
+    assert ranked[0][2] - ranked[1][2] < 0.05
+
+    result = centroid_router()._classify_with_centroids("q", query)
+    assert result["query_type"] == "multi_section"
+    assert result["sections"] == ["tracklist", "recording_production"]
+    assert result["method"] == "embedding"
+
+
+def test_distant_runner_up_is_dropped():
+    result = centroid_router()._classify_with_centroids("q", unit(1, -0.3, 0))
+    assert result["query_type"] == "single" and result["sections"] == ["tracklist"]
+
+
+def test_low_confidence_defers_to_the_llm():
+    assert centroid_router(threshold=0.99)._classify_with_centroids("q", unit(1, 0.14, 0)) is None
+
+
+def test_centroids_are_rebuilt_when_the_collection_changes():
+    from query_handler import QueryHandler
+
+    db = FakeVectorstore()
+    db.add(unit(1, 0, 0), "tracklist")
+    db.add(unit(0, 0, 1), "live_history", album="From Mars to Sirius")
+
+    handler = QueryHandler.__new__(QueryHandler)
+    handler.db = db
+    handler.snapshot = False
+    handler.collection_check_interval = 0
+    handler._fingerprint = None
+    handler.router = centroid_router()
+    handler.section_store_enabled = False
+    handler.retrieval_mode = "similarity"
+    handler._views_lock = threading.Lock()
+    handler._views_fingerprint = None
+
+    handler._sync_collection_views()
+    assert handler.router.centroid_classifier.section_labels == ["live_history", "tracklist"]
+
+    db.add(unit(0, 1, 0), "philosophy")
+    handler._sync_collection_views()
+    assert "philosophy" in handler.router.centroid_classifier.section_labels
+    assert handler.router.centroid_classifier.classify_sections(unit(0, 1, 0))[0][0] == "philosophy"
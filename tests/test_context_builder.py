@@ -0,0 +1,52 @@
+from langchain_core.documents import Document
+
+from context_builder import ContextBuilder
+
+TEXT = " ".join(f"Sentence number {i} about the band." for i in range(40))
+
+
+def text(start, end):
+    return TEXT[start:end].strip()
+
+
+def chunk(start, end, index, **metadata):
+    return Document(page_content=text(start, end),
+                    metadata={"source": "bio.md", "chunk_index": index, **metadata})
+
+
+def test_overlapping_chunks_merge_into_one_passage_in_document_order():
+    builder = ContextBuilder(section_tokens=10_000)
+    # Retrieved out of order, each overlapping its neighbour by 100 characters
+    docs = [chunk(400, 900, 1), chunk(0, 500, 0), chunk(800, 1300, 2)]
+    assert builder.assemble(docs) == [text(0, 1300)]
+
+
+def test_duplicates_and_contained_chunks_are_dropped():
+    builder = ContextBuilder(section_tokens=10_000)
+    docs = [chunk(0, 500, 0), chunk(0, 500, 0), chunk(100, 300, 5)]
+    assert builder.assemble(docs) == [text(0, 500)]
+
+
+def test_budget_keeps_the_most_relevant_and_trims_a_lone_chunk():
+    builder = ContextBuilder()
+    far_apart = [chunk(0, 300, 0), chunk(600, 900, 3)]
+    assert builder.assemble(far_apart, max_tokens=100) == [text(0, 300)]
+
+    trimmed = builder.assemble([chunk(0, 1300, 0)], max_tokens=50)
+    assert len(trimmed) == 1 and len(trimmed[0]) <= 200
+    assert trimmed[0].endswith(".")
+
+
+def test_enumerations_are_never_cut():
+    builder = ContextBuilder()
+    docs = [chunk(0, 300, 0), chunk(600, 900, 3, type="enumeration")]
+    assert builder.assemble(docs, max_tokens=100) == [text(0, 300), text(600, 900)]
+
+
+def test_build_splits_the_budget_across_album_section_groups():
+    builder = ContextBuilder(section_tokens=800, max_tokens=150)
+    assert builder.group_budget(3) == 50
+    docs = [chunk(0, 300, 0, section="Biography"), chunk(0, 300, 0, section="Tours")]
+    context = builder.build(docs)
+    assert context.count("\n\n") == 1
+    assert len(context) <= 2 * 75 * ContextBuilder.CHARS_PER_TOKEN + 2
@@ -0,0 +1,69 @@
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import CachedEmbeddings, EmbeddingStore
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return [[float(len(text)), 1.0, 2.0] for text in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [float(len(text)), 0.0, 0.0]
+
+
+def test_two_writers_never_share_a_row(tmp_path):
+    store_a = EmbeddingStore(str(tmp_path))
+    store_b = EmbeddingStore(str(tmp_path))
+
+    store_a.put_many(["chunkA"], [[1.0, 1.0]])
+    store_b.put_many(["chunkB"], [[2.0, 2.0]])
+
+    reloaded = EmbeddingStore(str(tmp_path))
+    assert reloaded.get_many(["chunkA"])[0].tolist() == [1.0, 1.0]
+    assert reloaded.get_many(["chunkB"])[0].tolist() == [2.0, 2.0]
+    # Each writer also sees what the other appended
+    assert store_a.get_many(["chunkB"])[0].tolist() == [2.0, 2.0]
+
+
+def test_readers_see_rows_appended_after_they_opened(tmp_path):
+    writer = EmbeddingStore(str(tmp_path))
+    writer.put_many(["first"], [[1.0, 0.0]])
+    reader = EmbeddingStore(str(tmp_path), readonly=True)
+
+    rows = [[float(i), 0.0] for i in range(EmbeddingStore.INITIAL_CAPACITY + 10)]
+    writer.put_many([f"key{i}" for i in range(len(rows))], rows)
+
+    found = reader.get_many(["first", "key1030"])
+    assert found[0].tolist() == [1.0, 0.0]
+    assert np.allclose(found[1], [1030.0, 0.0])
+
+
+def test_query_embeddings_stay_in_memory(tmp_path):
+    base = CountingEmbeddings()
+    store = EmbeddingStore(str(tmp_path))
+    embeddings = CachedEmbeddings(base, store, namespace="test", query_cache_size=2)
+
+    embeddings.embed_query("one")
+    embeddings.embed_query("one")
+    assert base.calls == 1
+    assert len(store) == 0
+
+    embeddings.embed_query("two")
+    embeddings.embed_query("three")
+    embeddings.embed_query("one")  # evicted by the LRU bound
+    assert base.calls == 4
+
+
+def test_documents_are_persisted(tmp_path):
+    base = CountingEmbeddings()
+    CachedEmbeddings(base, EmbeddingStore(str(tmp_path)), namespace="test").embed_documents(["a", "bb"])
+
+    again = CachedEmbeddings(base, EmbeddingStore(str(tmp_path)), namespace="test")
+    assert again.embed_documents(["bb", "a"]) == [[2.0, 1.0, 2.0], [1.0, 1.0, 2.0]]
+    assert base.calls == 2
@@ -0,0 +1,72 @@
+import pytest
+
+from router import QueryRouter
+
+BOTH = ["The Link", "From Mars to Sirius"]
+
+
+def make_router(threshold=0.8):
+    # The fast path only needs the class tables, the compiled matcher and its threshold
+    router = QueryRouter.__new__(QueryRouter)
+    router._keyword_matcher = QueryRouter.build_keyword_matcher()
+    router.fast_path_threshold = threshold
+    return router
+
+
+# confidence = 0.45 + 0.3 if the album (or comparison) is explicit + 0.1 * min(section margin, 2)
+# None = not confident enough at the default 0.8 threshold, so the LLM routes it
+FAST_PATH_CASES = [
+    # Explicit single album, clear top section
+    ("How many songs are in The Link?", "single", "tracklist", ["The Link"], 0.95),
+    ("What is the guitar work like on From Mars to Sirius?",
+     "single", "technical_analysis", ["From Mars to Sirius"], 0.85),
+    ("Tell me about the production and recording of The Link",
+     "single", "recording_production", ["The Link"], 0.85),
+    # Explicit comparison: both albums named, or "both"
+    ("Compare the technical analysis between The Link and From Mars to Sirius",
+     "compare", "technical_analysis", BOTH, 0.85),
+    ("What are the differences in lyrical themes between both albums?",
+     "compare", "lyrics_themes", BOTH, 0.95),
+    # Tied sections (margin 0): 0.75
+    ("Who is the producer of The Link?", None, None, None, None),
+    ("What is the meaning of The Link?", None, None, None, None),
+    # No album named (not explicit): at most 0.65
+    ("What are the lyrical themes?", None, None, None, None),
+    # Comparison naming only one album is not explicit
+    ("Compare the guitar on The Link", None, None, None, None),
+    ("How do the songs differ versus earlier work?", None, None, None, None),
+    # No section keyword at all
+    ("Who is Joe Duplantier?", None, None, None, None),
+]
+
+
+@pytest.mark.parametrize("query, query_type, section, albums, confidence", FAST_PATH_CASES)
+def test_fast_path_decisions_at_the_default_threshold(query, query_type, section, albums, confidence):
+    result = make_router()._classify_fast_path(query)
+    if query_type is None:
+        assert result is None
+        return
+    assert result == {
+        "query_type": query_type,
+        "sections": [section],
+        "albums": albums,
+        "confidence": confidence,
+        "method": "keyword_fast_path"
+    }
+
+
+@pytest.mark.parametrize("threshold, query, taken", [
+    # 0.85 = explicit album, margin 1
+    (0.84, "What is The Link album about?", True),
+    (0.86, "What is The Link album about?", False),
+    # 0.75 = explicit album, tied sections
+    (0.75, "Who is the producer of The Link?", True),
+    (0.76, "Who is the producer of The Link?", False),
+    # 0.65 = no album, margin capped at 2
+    (0.65, "What are the lyrical themes?", True),
+    (0.66, "What are the lyrical themes?", False),
+    # Above 1 always defers to the LLM
+    (1.01, "How many songs are in The Link?", False),
+])
+def test_threshold_boundary(threshold, query, taken):
+    assert (make_router(threshold)._classify_fast_path(query) is not None) == taken
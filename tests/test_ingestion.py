@@ -0,0 +1,113 @@
+import random
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from ingestion import iter_text_chunks
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa".split()
+
+
+def make_text(seed: int, line_joiner: str, paragraph_joiner: str, size: int = 450_000) -> str:
+    rng = random.Random(seed)
+    paragraphs = []
+    total = 0
+    while total < size:
+        lines = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 40)))
+                 for _ in range(rng.randint(1, 8))]
+        paragraph = line_joiner.join(lines)
+        paragraphs.append(paragraph)
+        total += len(paragraph) + len(paragraph_joiner)
+    return paragraph_joiner.join(paragraphs)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("line_joiner,paragraph_joiner", [
+    (" ", "\n\n"),     # long paragraphs split below the top separator
+    ("\n", "\n\n"),    # short lines inside paragraphs
+    (" ", "\n"),       # no blank lines at all
+    ("\n", "\n\n\n"),  # extra blank lines between paragraphs
+])
+def test_streamed_chunks_match_whole_file_split(tmp_path, seed, line_joiner, paragraph_joiner):
+    text = make_text(seed, line_joiner, paragraph_joiner)
+    path = tmp_path / "section.txt"
+    path.write_text(text, encoding="utf-8")
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
+
+    assert list(iter_text_chunks(str(path), splitter)) == splitter.split_text(text)
+
+
+def test_block_boundary_on_whitespace_keeps_words_apart(tmp_path):
+    block_size = 1 << 16
+    # First seed whose first block ends on the space between two words
+    text = next(text for text in (make_text(seed, " ", " ") for seed in range(100))
+                if text[block_size - 1] == " ")
+    path = tmp_path / "section.txt"
+    path.write_text(text, encoding="utf-8")
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
+
+    chunks = list(iter_text_chunks(str(path), splitter, block_size=block_size))
+
+    assert chunks == splitter.split_text(text)
+    assert {token for chunk in chunks for token in chunk.split()} <= set(WORDS)
+
+
+def db_manifest(tmp_path, file_config=None, splitter=None):
+    data = tmp_path / "data"
+    data.mkdir(exist_ok=True)
+    (data / "tracklist.txt").write_text("1. First\n2. Second\n3. Third\n", encoding="utf-8")
+    file_config = file_config or {"section": "tracklist", "type": "enumeration", "split": False}
+    return {
+        "persist_directory": str(tmp_path / "db"),
+        "splitter": splitter or {"chunk_size": 500, "chunk_overlap": 100},
+        "albums": {"Album": {"directory": str(data), "files": {"tracklist.txt": file_config}}}
+    }
+
+
+def make_engine(tmp_path, file_config, splitter=None):
+    from langchain_chroma import Chroma
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from ingestion import IngestionEngine
+
+    manifest = db_manifest(tmp_path, file_config, splitter)
+    db = Chroma(persist_directory=manifest["persist_directory"],
+                embedding_function=DeterministicFakeEmbedding(size=8))
+    return IngestionEngine(manifest, db=db), db
+
+
+def test_manifest_changes_replan_unchanged_files(tmp_path):
+    config = {"section": "tracklist", "type": "enumeration", "split": False}
+    engine, _ = make_engine(tmp_path, config)
+    assert engine.run()["files_updated"] == 1
+
+    engine, _ = make_engine(tmp_path, config)
+    assert engine.run()["files_skipped"] == 1
+
+    engine, db = make_engine(tmp_path, dict(config, section="songs"))
+    stats = engine.run()
+    assert stats["files_updated"] == 1
+    sections = {metadata["section"] for metadata in db.get(include=["metadatas"])["metadatas"]}
+    assert sections == {"songs"}
+
+    engine, _ = make_engine(tmp_path, dict(config, section="songs"), {"chunk_size": 20, "chunk_overlap": 0})
+    assert engine.run()["files_updated"] == 1
+
+
+def test_ingestion_writes_live_directory_in_snapshot_mode(tmp_path, monkeypatch):
+    from langchain_chroma import Chroma
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    import resources
+    from ingestion import IngestionEngine
+
+    embeddings = DeterministicFakeEmbedding(size=8)
+    monkeypatch.setattr(resources, "get_embeddings", lambda: embeddings)
+    monkeypatch.setattr(resources, "_vectorstores", {})
+    monkeypatch.setattr(resources, "_snapshots", {})
+    monkeypatch.setenv("VECTORSTORE_MODE", "snapshot")
+
+    engine = IngestionEngine(db_manifest(tmp_path))
+    assert engine.run()["files_updated"] == 1
+    assert not resources._snapshots
+
+    live = Chroma(persist_directory=str(tmp_path / "db"), embedding_function=embeddings)
+    assert live._collection.count() == 1
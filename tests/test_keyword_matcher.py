@@ -0,0 +1,85 @@
+import pytest
+
+from keyword_matcher import KeywordMatcher
+from router import QueryRouter
+
+
+@pytest.fixture(scope="module")
+def router():
+    # Keyword routing only needs the class tables and the compiled matcher
+    router = QueryRouter.__new__(QueryRouter)
+    router._keyword_matcher = QueryRouter.build_keyword_matcher()
+    return router
+
+
+def matcher(*patterns, plural=False):
+    matcher = KeywordMatcher()
+    for phrase, label in patterns:
+        matcher.add(phrase, label, plural=plural)
+    return matcher
+
+
+def test_patterns_match_whole_words_only():
+    live = matcher(("live", "live_history"))
+    assert live.score("Who delivered the vocals?") == {}
+    assert live.score("Was it played live?") == {"live_history": 1.0}
+    assert live.score("Live, in Paris") == {"live_history": 1.0}
+
+
+def test_phrases_match_consecutive_tokens_and_score_their_length():
+    both = matcher(("both albums", "compare"))
+    assert both.score("Both albums compared") == {"compare": 2.0}
+    assert both.score("albums, both of them") == {}
+    assert matcher(("from mars to sirius", "fmts")).score("From-Mars-to-Sirius?") == {"fmts": 4.0}
+
+
+def test_overlapping_patterns_all_match():
+    live = matcher(("live", "live"), ("live performance", "performance"), ("performance", "technical"))
+    assert live.score("a live performance") == {"live": 1.0, "performance": 2.0, "technical": 1.0}
+    # "link" ends inside "the link" and is reported through its failure link
+    link = matcher(("the link", "album"), ("link", "album_word"))
+    assert link.score("the lint the link") == {"album": 2.0, "album_word": 1.0}
+
+
+def test_plural_adds_a_trailing_s_only():
+    song = matcher(("song", "tracklist"), plural=True)
+    assert song.score("songs and a song") == {"tracklist": 2.0}
+    assert song.score("songwriting") == {}
+
+
+# Outcomes of the pre-matcher substring loop, which the matcher must keep
+LEGACY_OUTCOMES = [
+    # demo_router.py
+    ("How many songs are in The Link?", "single", ["tracklist"], ["The Link"]),
+    ("What is the guitar work like on From Mars to Sirius?",
+     "single", ["technical_analysis"], ["From Mars to Sirius"]),
+    ("Compare the technical analysis between The Link and From Mars to Sirius",
+     "compare", ["technical_analysis"], ["The Link", "From Mars to Sirius"]),
+    ("What are the differences in lyrical themes between both albums?",
+     "compare", ["lyrics_themes"], ["The Link", "From Mars to Sirius"]),
+    ("Tell me about the production and recording of The Link",
+     "single", ["recording_production", "overview"], ["The Link"]),
+    ("What is The Link album about?", "single", ["overview"], ["The Link"]),
+    # bench_keyword_matcher.py and a few more
+    ("Was the live performance delivered well on the tour?",
+     "single", ["live_history", "technical_analysis"], ["The Link", "From Mars to Sirius"]),
+    ("How did critics review the recording?",
+     "single", ["reception_influence", "recording_production"], ["The Link", "From Mars to Sirius"]),
+    ("Which label released From Mars to Sirius?", "single", ["basic_info"], ["From Mars to Sirius"]),
+    ("Who is the producer of The Link?", "single", ["recording_production", "basic_info"], ["The Link"]),
+    ("Compare the guitar and bass on The Link", "compare", ["technical_analysis"], ["The Link"]),
+]
+
+# Deliberate differences: substrings inside longer words no longer match
+WORD_BOUNDARY_OUTCOMES = [
+    # "live" in "delivered"
+    ("Who delivered the vocals on The Link?", "single", ["technical_analysis"], ["The Link"]),
+    # "link" in "linked"
+    ("Is there a linked theme?", "single", ["lyrics_themes"], ["The Link", "From Mars to Sirius"]),
+]
+
+
+@pytest.mark.parametrize("query, query_type, sections, albums", LEGACY_OUTCOMES + WORD_BOUNDARY_OUTCOMES)
+def test_keyword_routing_outcomes(router, query, query_type, sections, albums):
+    result = router._classify_with_keywords(query)
+    assert (result["query_type"], result["sections"], result["albums"]) == (query_type, sections, albums)
@@ -0,0 +1,53 @@
+from lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+IDS = ["a", "b", "c", "d"]
+TEXTS = [
+    "Flying Whales is the opening track of From Mars to Sirius",
+    "The band toured Europe with Metallica in 2012",
+    "L'Enfant Sauvage was recorded in New York",
+    "Flying whales, whales everywhere: the whales return on Magma",
+]
+METADATAS = [
+    {"album": "From Mars to Sirius", "section": "Track listing"},
+    {"section": "Tours"},
+    {"album": "L'Enfant Sauvage", "section": "Recording"},
+    {"album": "Magma", "section": "Track listing"},
+]
+
+
+def ranked_ids(index, query, k=10, search_filter=None):
+    return [index.ids[row] for row, _ in index.search(query, k, search_filter)]
+
+
+def test_tokenize_folds_case_and_accents_and_drops_stopwords():
+    assert tokenize("The Élan of Gojira") == ["elan", "gojira"]
+
+
+def test_search_ranks_by_bm25_and_skips_unmatched_chunks():
+    index = BM25Index(IDS, TEXTS, METADATAS)
+    assert ranked_ids(index, "whales") == ["d", "a"]
+    assert ranked_ids(index, "whales", k=1) == ["d"]
+    assert ranked_ids(index, "unknownword") == []
+
+
+def test_search_applies_metadata_filters():
+    index = BM25Index(IDS, TEXTS, METADATAS)
+    assert ranked_ids(index, "whales", search_filter={"album": "From Mars to Sirius"}) == ["a"]
+    assert ranked_ids(index, "whales", search_filter={"album": {"$nin": ["Magma"]}}) == ["a"]
+    assert set(ranked_ids(index, "whales europe", search_filter={"$or": [
+        {"section": "Tours"}, {"album": "Magma"}
+    ]})) == {"b", "d"}
+    # Chunks without the field only match $ne/$nin
+    assert ranked_ids(index, "europe", search_filter={"album": {"$ne": "Magma"}}) == ["b"]
+    assert ranked_ids(index, "whales", search_filter={"missing": "x"}) == []
+
+
+def test_index_keeps_no_texts():
+    index = BM25Index(IDS, TEXTS, METADATAS)
+    assert not hasattr(index, "texts")
+    assert not hasattr(index, "metadatas")
+    assert index.nbytes > 0
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    assert reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]]) == ["b", "a", "d", "c"]
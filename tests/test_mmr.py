@@ -0,0 +1,37 @@
+import numpy as np
+
+from mmr import mmr_select
+
+QUERY = [1.0, 0.0, 0.0]
+
+
+def test_prefers_a_diverse_second_pick_over_a_near_duplicate():
+    candidates = np.array([
+        [1.0, 0.1, 0.0],
+        [1.0, 0.12, 0.0],   # near copy of the first
+        [0.8, 0.0, 0.6],
+    ])
+    assert mmr_select(QUERY, candidates, k=2, max_redundancy=1.01) == [0, 2]
+
+
+def test_lambda_one_is_pure_relevance():
+    candidates = np.array([[0.5, 0.5, 0.0], [1.0, 0.1, 0.0], [1.0, 0.11, 0.0]])
+    assert mmr_select(QUERY, candidates, k=3, lambda_mult=1.0, max_redundancy=1.01) == [1, 2, 0]
+
+
+def test_relevance_cutoff_returns_fewer_than_k():
+    candidates = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]])
+    assert mmr_select(QUERY, candidates, k=3, min_relevance=0.5) == [0]
+    assert mmr_select(QUERY, candidates, k=3, relevance_window=0.2) == [0]
+    # min_results keeps the best ones even below the floor
+    assert mmr_select(QUERY, candidates, k=3, min_relevance=2.0, min_results=1) == [0]
+
+
+def test_skips_near_duplicates():
+    candidates = np.array([[1.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.7, 0.7, 0.0]])
+    assert mmr_select(QUERY, candidates, k=3) == [0, 2]
+
+
+def test_empty_inputs():
+    assert mmr_select(QUERY, np.zeros((0, 3)), k=3) == []
+    assert mmr_select(QUERY, np.eye(3), k=0) == []
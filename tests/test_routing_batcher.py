@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+from admission import AdmissionController, QueueTimeoutError
+from routing_batcher import RoutingBatcher
+
+ROUTING = {"query_type": "single", "sections": ["overview"], "albums": ["The Link"], "confidence": 0.9}
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        return prompt
+
+
+class FakeRouter:
+    """Just enough of QueryRouter for the batcher"""
+
+    def __init__(self, llm_gate):
+        self.llm = FakeLLM()
+        self.llm_gate = llm_gate
+        self.queue_timeout = 0.05
+        self.single_requests = 0
+
+    def _build_batch_routing_prompt(self, queries):
+        return json.dumps(queries)
+
+    def _parse_batch_routing_response(self, raw, count):
+        return {i: dict(ROUTING) for i in range(count)}
+
+    async def _arequest_routing(self, query):
+        self.single_requests += 1
+        async with self.llm_gate.aslot(timeout=self.queue_timeout):
+            return dict(ROUTING)
+
+
+def test_concurrent_queries_share_one_llm_call():
+    router = FakeRouter(AdmissionController(max_concurrent=1))
+    batcher = RoutingBatcher(router, window_ms=20, max_batch=8)
+
+    async def run():
+        return await asyncio.gather(*(batcher.classify(f"query {i}") for i in range(5)))
+
+    results = asyncio.run(run())
+
+    assert results == [ROUTING] * 5
+    assert len(router.llm.prompts) == 1
+    assert router.single_requests == 0
+
+
+def test_rejected_batch_is_not_retried_query_by_query():
+    gate = AdmissionController(max_concurrent=1, max_queue=4)
+    router = FakeRouter(gate)
+    batcher = RoutingBatcher(router, window_ms=5, max_batch=8)
+
+    async def run():
+        # Saturate the only slot so the batch times out in the queue
+        await gate.aacquire()
+        try:
+            return await asyncio.gather(*(batcher.classify(f"query {i}") for i in range(3)),
+                                        return_exceptions=True)
+        finally:
+            gate.release()
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, QueueTimeoutError) for result in results)
+    assert router.single_requests == 0
+    assert batcher.stats()["rejected"] == 1
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+from routing_cache import RoutingCache
+
+ROUTING = {"query_type": "single", "sections": ["tracklist"], "albums": ["The Link"], "confidence": 0.9}
+
+
+def key(query, version="1", model="mistral"):
+    return RoutingCache.make_key(query, version, model)
+
+
+def test_key_normalizes_case_whitespace_and_trailing_punctuation():
+    assert key("What is the tracklist?") == key("  what IS   the\ttracklist ")
+    assert key("What is the tracklist?") != key("What is the tracklist of Magma?")
+    assert RoutingCache.normalize_query(" Who plays  bass?! ") == "who plays bass"
+
+
+def test_key_changes_with_prompt_version_and_model():
+    assert key("q", version="1") != key("q", version="2")
+    assert key("q", model="mistral") != key("q", model="llama3")
+
+
+def test_returned_routing_is_a_copy():
+    cache = RoutingCache()
+    cache.set(key("q"), ROUTING)
+    cache.get(key("q"))["method"] = "routing_cache"
+    assert cache.get(key("q")) == ROUTING
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    cache = RoutingCache(max_entries=2)
+    cache.set("a", ROUTING)
+    cache.set("b", ROUTING)
+    assert cache.get("a") is not None
+    cache.set("c", ROUTING)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["entries"] == 2
+
+
+def test_sqlite_tier_survives_a_reopen(tmp_path):
+    db_path = str(tmp_path / "routing_cache.sqlite3")
+    RoutingCache(db_path=db_path).set(key("What is the tracklist?"), ROUTING)
+
+    reopened = RoutingCache(db_path=db_path)
+    assert reopened.get(key("what is the tracklist")) == ROUTING
+    assert reopened.get(key("what is the tracklist")) == ROUTING
+    stats = reopened.stats()
+    assert stats["disk_hits"] == 1 and stats["memory_hits"] == 1
+
+
+def test_memory_eviction_falls_back_to_disk(tmp_path):
+    cache = RoutingCache(max_entries=1, db_path=str(tmp_path / "routing_cache.sqlite3"))
+    cache.set("a", ROUTING)
+    cache.set("b", ROUTING)
+    assert cache.get("a") == ROUTING
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    db_path = str(tmp_path / "routing_cache.sqlite3")
+    cache = RoutingCache(db_path=db_path)
+    cache.set("a", ROUTING)
+    cache.clear()
+    assert cache.get("a") is None
+    assert RoutingCache(db_path=db_path).get("a") is None
+
+
+def test_async_router_reads_and_writes_sqlite_off_the_event_loop(tmp_path):
+    from router import QueryRouter
+
+    router = QueryRouter.__new__(QueryRouter)
+    router.routing_cache = RoutingCache(db_path=str(tmp_path / "routing_cache.sqlite3"))
+    router.llm_model = "mistral"
+    threads = []
+    get_cached, cache = router._get_cached_routing, router._cache_routing
+    router._get_cached_routing = lambda query: threads.append(threading.get_ident()) or get_cached(query)
+    router._cache_routing = lambda query, result: threads.append(threading.get_ident()) or cache(query, result)
+
+    async def scenario():
+        await router._acache_routing("q", ROUTING)
+        return await router._aget_cached_routing("q"), threading.get_ident()
+
+    cached, loop_thread = asyncio.run(scenario())
+    assert cached["sections"] == ["tracklist"] and cached["method"] == "routing_cache"
+    assert len(threads) == 2 and loop_thread not in threads
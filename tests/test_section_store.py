@@ -0,0 +1,129 @@
+import threading
+
+import query_handler
+from section_store import SectionStore
+
+TRACKLIST = [
+    "1. Remembrance\n2. Torii\n3. Connected",
+    "4. Embrace the World\n5. Inward Movements",
+]
+PROSE = " ".join(f"Sentence {i} about how the album was recorded." for i in range(20))
+
+
+class FakeCollection:
+    def __init__(self, db):
+        self.db = db
+        self.counts = 0
+
+    def count(self):
+        self.counts += 1
+        return len(self.db.ids)
+
+
+class FakeVectorstore:
+    """Just enough of Chroma for SectionStore.from_vectorstore and the collection fingerprint"""
+
+    def __init__(self):
+        self.ids, self.documents, self.metadatas = [], [], []
+        self._collection = FakeCollection(self)
+
+    def add(self, text, **metadata):
+        self.ids.append(str(len(self.ids)))
+        self.documents.append(text)
+        self.metadatas.append(metadata)
+
+    def get(self, include=None):
+        return {"ids": self.ids, "documents": self.documents, "metadatas": self.metadatas}
+
+
+def make_db():
+    db = FakeVectorstore()
+    # Stored out of order, with the overlap the splitter leaves between chunks
+    db.add(PROSE[300:], album="The Link", section="recording_production", source="link.md", chunk_index=1)
+    db.add(PROSE[:350], album="The Link", section="recording_production", source="link.md", chunk_index=0)
+    for index, text in enumerate(TRACKLIST):
+        db.add(text, album="The Link", section="tracklist", type="enumeration", source="link.md", chunk_index=index)
+    db.add("A short overview.", album="From Mars to Sirius", section="overview", source="fmts.md", chunk_index=0)
+    db.add("No album on this chunk.", section="overview")
+    return db
+
+
+def test_sections_are_reassembled_in_order_without_overlap():
+    store = SectionStore.from_vectorstore(make_db())
+    assert set(store.sections) == {
+        ("The Link", "recording_production"), ("The Link", "tracklist"), ("From Mars to Sirius", "overview")
+    }
+    assert store.sections[("The Link", "recording_production")] == {"text": PROSE, "type": "prose", "chunks": 2}
+    assert store.sections[("The Link", "tracklist")]["text"] == "\n\n".join(TRACKLIST)
+    assert store.sections[("The Link", "tracklist")]["type"] == "enumeration"
+
+
+def test_enumerations_are_served_whatever_their_size():
+    store = SectionStore.from_vectorstore(make_db(), max_chars=10)
+    assert store.serves("The Link", "tracklist")
+    assert not store.serves("The Link", "recording_production")
+    assert not store.serves("The Link", "missing")
+
+    store = SectionStore.from_vectorstore(make_db(), max_chars=len(PROSE))
+    assert store.serves("The Link", "recording_production")
+
+
+def test_context_requires_every_routed_pair():
+    store = SectionStore.from_vectorstore(make_db(), max_chars=100)
+    context = store.context_for({"albums": ["The Link"], "sections": ["tracklist"]})
+    [document] = context["The Link_tracklist"]
+    assert document.page_content == "\n\n".join(TRACKLIST)
+    assert document.metadata == {"album": "The Link", "section": "tracklist",
+                                 "type": "enumeration", "source": "section_store"}
+
+    # One pair falls back to vector search, so the whole request does
+    assert store.context_for({"albums": ["The Link"], "sections": ["tracklist", "recording_production"]}) is None
+    assert store.context_for({"albums": ["The Link", "From Mars to Sirius"], "sections": ["tracklist"]}) is None
+    assert store.context_for({"albums": [], "sections": ["tracklist"]}) is None
+
+
+def make_handler(db, interval, snapshot=False):
+    handler = query_handler.QueryHandler.__new__(query_handler.QueryHandler)
+    handler.db = db
+    handler.snapshot = snapshot
+    handler.router = type("Router", (), {"mode": "tiered"})()
+    handler.retrieval_mode = "similarity"
+    handler.section_store_enabled = True
+    handler.section_store_max_chars = 1500
+    handler.collection_check_interval = interval
+    handler._fingerprint = None
+    handler._fingerprint_checked = 0.0
+    handler._views_fingerprint = None
+    handler._views_lock = threading.Lock()
+    return handler
+
+
+def test_collection_is_checked_at_most_once_per_interval(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(query_handler.time, "monotonic", lambda: now[0])
+    db = make_db()
+    handler = make_handler(db, interval=5)
+
+    for _ in range(10):
+        handler._sync_collection_views()
+    assert db._collection.counts == 1
+
+    db.add("Recorded live in Bayonne.", album="The Link", section="live_history", source="link.md", chunk_index=0)
+    handler._sync_collection_views()
+    assert not handler.section_store.serves("The Link", "live_history")
+
+    now[0] += 5
+    handler._sync_collection_views()
+    assert handler.section_store.serves("The Link", "live_history")
+    assert db._collection.counts == 2
+
+
+def test_snapshot_is_checked_once(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(query_handler.time, "monotonic", lambda: now[0])
+    db = make_db()
+    handler = make_handler(db, interval=5, snapshot=True)
+    handler._sync_collection_views()
+    now[0] += 3600
+    handler._sync_collection_views()
+    assert db._collection.counts == 1
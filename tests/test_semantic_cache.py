@@ -0,0 +1,92 @@
+import numpy as np
+
+import semantic_cache
+from semantic_cache import SemanticCache
+
+ROUTING = {"query_type": "single", "sections": ["Biography"], "albums": [], "confidence": 0.9}
+
+
+def unit(angle_degrees):
+    """2-D unit vector, so cosine similarity between two is cos(angle difference)"""
+    angle = np.radians(angle_degrees)
+    return [float(np.cos(angle)), float(np.sin(angle))]
+
+
+def test_hit_above_threshold_and_miss_below():
+    cache = SemanticCache(threshold=0.95)
+    cache.store(unit(0), 10, ROUTING, "answer")
+
+    hit = cache.lookup(unit(15), 10)  # cos 15deg = 0.966
+    assert hit["answer"] == "answer" and hit["routing"] == ROUTING
+    assert abs(hit["similarity"] - np.cos(np.radians(15))) < 1e-5
+    assert cache.lookup(unit(20), 10) is None  # cos 20deg = 0.940
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_scale_does_not_matter():
+    cache = SemanticCache(threshold=0.95)
+    cache.store([3.0, 0.0], 10, ROUTING, "answer")
+    assert cache.lookup([0.5, 0.01], 10)["answer"] == "answer"
+
+
+def test_best_match_wins():
+    cache = SemanticCache(threshold=0.9)
+    cache.store(unit(0), 10, ROUTING, "zero")
+    cache.store(unit(20), 10, ROUTING, "twenty")
+    assert cache.lookup(unit(14), 10)["answer"] == "twenty"
+    assert cache.lookup(unit(6), 10)["answer"] == "zero"
+
+
+def test_only_entries_with_the_same_k_match():
+    cache = SemanticCache(threshold=0.95)
+    cache.store(unit(0), 10, ROUTING, "k10")
+    assert cache.lookup(unit(0), 5) is None
+
+    cache.store(unit(10), 5, ROUTING, "k5")
+    # The identical k10 vector is ignored in favour of the k5 entry
+    assert cache.lookup(unit(0), 5)["answer"] == "k5"
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "monotonic", lambda: now[0])
+    cache = SemanticCache(threshold=0.95, ttl_seconds=60)
+    cache.store(unit(0), 10, ROUTING, "answer")
+
+    now[0] += 59
+    assert cache.lookup(unit(0), 10) is not None
+    now[0] += 2
+    assert cache.lookup(unit(0), 10) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(threshold=0.99, max_entries=2)
+    cache.store(unit(0), 10, ROUTING, "a")
+    cache.store(unit(45), 10, ROUTING, "b")
+    assert cache.lookup(unit(0), 10)["answer"] == "a"  # "b" is now least recent
+    cache.store(unit(90), 10, ROUTING, "c")
+
+    assert cache.lookup(unit(45), 10) is None
+    assert cache.lookup(unit(0), 10)["answer"] == "a"
+    assert cache.lookup(unit(90), 10)["answer"] == "c"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_fingerprint_change_clears_the_cache():
+    cache = SemanticCache(threshold=0.95)
+    cache.store(unit(0), 10, ROUTING, "old", fingerprint=(100, 1.0))
+    assert cache.lookup(unit(0), 10, fingerprint=(100, 1.0))["answer"] == "old"
+    assert cache.lookup(unit(0), 10, fingerprint=(101, 2.0)) is None
+    assert cache.stats()["entries"] == 0
+
+    # Slots are reusable after the clear
+    cache.store(unit(0), 10, ROUTING, "new", fingerprint=(101, 2.0))
+    assert cache.lookup(unit(0), 10, fingerprint=(101, 2.0))["answer"] == "new"
+
+
+def test_returned_routing_is_a_copy():
+    cache = SemanticCache(threshold=0.95)
+    cache.store(unit(0), 10, ROUTING, "answer")
+    cache.lookup(unit(0), 10)["routing"]["sections"] = ["Tours"]
+    assert cache.lookup(unit(0), 10)["routing"] == ROUTING